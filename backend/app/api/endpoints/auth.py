@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from pydantic import BaseModel
 from typing import Optional
 
-from app.core.config import settings
+from app.core.security import (
+    authenticate_token,
+    create_access_token,
+    create_refresh_token,
+    revoke_token,
+    verify_token,
+)
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
@@ -12,41 +17,45 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 # Simple user storage (in production, use proper authentication)
 users_db = {}
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
-    return encoded_jwt
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+def issue_tokens(username: str) -> dict:
+    return {
+        "access_token": create_access_token(data={"sub": username}),
+        "refresh_token": create_refresh_token(data={"sub": username}),
+        "token_type": "bearer",
+    }
+
+def credentials_error() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    return {"username": username, "role": "admin"}
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    user = authenticate_token(token)
+    if user is None:
+        raise credentials_error()
+    return user
+
+async def get_token_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    """The verified claims of the request's access token"""
+    claims = verify_token(token)
+    if claims is None:
+        raise credentials_error()
+    return claims
 
 @router.post("/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     # In production, verify against macOS user database
     if form_data.username == "admin" and form_data.password == "admin":
-        access_token = create_access_token(data={"sub": form_data.username})
         return {
-            "access_token": access_token,
-            "token_type": "bearer",
+            **issue_tokens(form_data.username),
             "user": {
                 "id": "1",
                 "username": form_data.username,
@@ -62,8 +71,35 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+@router.post("/refresh")
+async def refresh(body: RefreshRequest):
+    """Exchange a refresh token for a new token pair
+
+    The refresh token is single-use: it is revoked once exchanged.
+    """
+    claims = verify_token(body.refresh_token, token_type="refresh")
+    if claims is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    await revoke_token(claims)
+    return issue_tokens(claims["sub"])
+
 @router.post("/logout")
-async def logout(current_user: dict = Depends(get_current_user)):
+async def logout(
+    body: Optional[LogoutRequest] = None,
+    access_claims: dict = Depends(get_token_claims),
+):
+    """Revoke the access token and, if given, its refresh token"""
+    # Verified once by the dependency; checking again here could race
+    # with expiry and find nothing to revoke
+    await revoke_token(access_claims)
+    if body is not None and body.refresh_token:
+        claims = verify_token(body.refresh_token, token_type="refresh")
+        if claims is not None and claims["sub"] == access_claims["sub"]:
+            await revoke_token(claims)
     return {"message": "Successfully logged out"}
 
 @router.get("/me")
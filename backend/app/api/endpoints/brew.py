@@ -1,37 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
-import subprocess
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
 import json
-import os
 
 from app.api.endpoints.auth import get_current_user
+from app.core.commands import CommandCancelled, run_command
+from app.services.brew import PACKAGE_NAME, BrewOutcomeParser, brew_inventory, brew_outdated, chunked
+from app.services.jobs import job_manager
 
 router = APIRouter()
 
-def run_command(cmd: list, check: bool = True) -> tuple:
-    """Run a shell command and return output"""
-    try:
-        result = subprocess.run(
-            cmd, 
-            capture_output=True, 
-            text=True, 
-            check=check
-        )
-        return result.returncode, result.stdout, result.stderr
-    except subprocess.CalledProcessError as e:
-        return e.returncode, e.stdout, e.stderr
-    except FileNotFoundError:
-        return -1, "", "Command not found"
+class BatchRequest(BaseModel):
+    formulae: List[str] = []
+    casks: List[str] = []
+    # Split into several brew invocations of at most this many packages;
+    # by default each kind goes into a single invocation
+    chunk_size: Optional[int] = Field(None, ge=1)
 
 @router.get("/check-cli-tools")
-async def check_cli_tools(current_user: dict = Depends(get_current_user)):
+async def check_cli_tools(request: Request, current_user: dict = Depends(get_current_user)):
     """Check if Command Line Tools are installed"""
     # Check for git which is part of CLI tools
-    returncode, _, _ = run_command(['which', 'git'], check=False)
+    returncode, _, _ = await run_command(['which', 'git'], request=request)
     
     # Also check for clang
     clang_installed = False
     if returncode == 0:
-        returncode2, _, _ = run_command(['which', 'clang'], check=False)
+        returncode2, _, _ = await run_command(['which', 'clang'], request=request)
         clang_installed = returncode2 == 0
     
     is_installed = returncode == 0 and clang_installed
@@ -42,42 +38,35 @@ async def check_cli_tools(current_user: dict = Depends(get_current_user)):
     }
 
 @router.post("/install-cli-tools")
-async def install_cli_tools(current_user: dict = Depends(get_current_user)):
+async def install_cli_tools(request: Request, current_user: dict = Depends(get_current_user)):
     """Install Command Line Tools"""
     try:
         # Trigger CLI tools installation
-        result = subprocess.run(
-            ['xcode-select', '--install'],
-            capture_output=True,
-            text=True
-        )
+        _, stdout, stderr = await run_command(['xcode-select', '--install'], request=request)
         
         return {
             "success": True,
             "message": "Command Line Tools installation triggered. Please follow the dialog that appears.",
-            "output": result.stdout,
-            "error": result.stderr if result.stderr else None
+            "output": stdout,
+            "error": stderr if stderr else None
         }
+    except CommandCancelled:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/check-brew")
 async def check_brew(current_user: dict = Depends(get_current_user)):
     """Check if Homebrew is installed"""
-    returncode, stdout, _ = run_command(['which', 'brew'], check=False)
-    
-    is_installed = returncode == 0
+    inventory = await brew_inventory.get()
+    is_installed = inventory["installed"]
     
     brew_info = None
     if is_installed:
-        # Get brew version and prefix
-        _, version, _ = run_command(['brew', '--version'], check=False)
-        _, prefix, _ = run_command(['brew', '--prefix'], check=False)
-        
         brew_info = {
-            "version": version.strip().split('\n')[0] if version else "Unknown",
-            "prefix": prefix.strip() if prefix else "/usr/local",
-            "path": stdout.strip()
+            "version": inventory["version"],
+            "prefix": inventory["prefix"],
+            "path": inventory["path"]
         }
     
     return {
@@ -197,15 +186,12 @@ async def get_brew_packages(current_user: dict = Depends(get_current_user)):
     
     # Check which packages are installed
     try:
-        # Get list of installed formulae
-        returncode, stdout, _ = run_command(['brew', 'list', '--formula', '-1'], check=False)
-        if returncode == 0:
-            installed = set(stdout.strip().split('\n'))
-            
-            # Update installed status
-            for category in packages.values():
-                for pkg in category["packages"]:
-                    pkg["installed"] = pkg["name"] in installed
+        installed = (await brew_inventory.get())["formulae"]
+        
+        # Update installed status
+        for category in packages.values():
+            for pkg in category["packages"]:
+                pkg["installed"] = pkg["name"] in installed
     except:
         pass
     
@@ -294,174 +280,211 @@ async def get_brew_casks(current_user: dict = Depends(get_current_user)):
     
     # Check which casks are installed
     try:
-        returncode, stdout, _ = run_command(['brew', 'list', '--cask', '-1'], check=False)
-        if returncode == 0:
-            installed = set(stdout.strip().split('\n'))
-            
-            for category in casks.values():
-                for cask in category["casks"]:
-                    cask["installed"] = cask["name"] in installed
+        installed = (await brew_inventory.get())["casks"]
+        
+        for category in casks.values():
+            for cask in category["casks"]:
+                cask["installed"] = cask["name"] in installed
     except:
         pass
     
     return casks
 
+def invalidate_inventory(job):
+    brew_inventory.invalidate()
+    brew_outdated.refresh_soon()
+
+def queue_brew_job(kind: str, commands: list, description: str, timeout: float) -> dict:
+    """Queue a brew mutation and return the job for the client to follow"""
+    job = job_manager.submit(
+        kind,
+        commands,
+        resource="brew",
+        description=description,
+        timeout=timeout,
+        on_finish=invalidate_inventory,
+    )
+    return {
+        "success": True,
+        "message": f"{description} queued",
+        "job": job.to_dict(),
+    }
+
 @router.post("/install/{package_name}")
 async def install_package(package_name: str, current_user: dict = Depends(get_current_user)):
-    """Install a Homebrew package"""
-    try:
-        result = subprocess.run(
-            ['brew', 'install', package_name],
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minute timeout
-        )
-        
-        if result.returncode == 0:
-            return {
-                "success": True,
-                "message": f"Successfully installed {package_name}",
-                "output": result.stdout
-            }
-        else:
-            return {
-                "success": False,
-                "message": f"Failed to install {package_name}",
-                "error": result.stderr
-            }
-    except subprocess.TimeoutExpired:
-        return {
-            "success": False,
-            "message": f"Installation of {package_name} timed out",
-            "error": "Operation took too long"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Install a Homebrew package in the background"""
+    return queue_brew_job(
+        "install",
+        [['brew', 'install', package_name]],
+        f"Installation of {package_name}",
+        timeout=300  # 5 minute timeout
+    )
 
 @router.post("/install-cask/{cask_name}")
 async def install_cask(cask_name: str, current_user: dict = Depends(get_current_user)):
-    """Install a Homebrew Cask"""
-    try:
-        result = subprocess.run(
-            ['brew', 'install', '--cask', cask_name],
-            capture_output=True,
-            text=True,
-            timeout=600  # 10 minute timeout for larger apps
-        )
-        
-        if result.returncode == 0:
-            return {
-                "success": True,
-                "message": f"Successfully installed {cask_name}",
-                "output": result.stdout
-            }
-        else:
-            return {
-                "success": False,
-                "message": f"Failed to install {cask_name}",
-                "error": result.stderr
-            }
-    except subprocess.TimeoutExpired:
-        return {
-            "success": False,
-            "message": f"Installation of {cask_name} timed out",
-            "error": "Operation took too long"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Install a Homebrew Cask in the background"""
+    return queue_brew_job(
+        "install-cask",
+        [['brew', 'install', '--cask', cask_name]],
+        f"Installation of {cask_name}",
+        timeout=600  # 10 minute timeout for larger apps
+    )
 
 @router.post("/uninstall/{package_name}")
 async def uninstall_package(package_name: str, current_user: dict = Depends(get_current_user)):
-    """Uninstall a Homebrew package"""
-    try:
-        result = subprocess.run(
-            ['brew', 'uninstall', package_name],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-        
-        if result.returncode == 0:
-            return {
-                "success": True,
-                "message": f"Successfully uninstalled {package_name}",
-                "output": result.stdout
-            }
-        else:
-            return {
-                "success": False,
-                "message": f"Failed to uninstall {package_name}",
-                "error": result.stderr
-            }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Uninstall a Homebrew package in the background"""
+    return queue_brew_job(
+        "uninstall",
+        [['brew', 'uninstall', package_name]],
+        f"Uninstallation of {package_name}",
+        timeout=60
+    )
+
+def queue_batch_job(kind: str, action: str, body: BatchRequest, per_package_timeout: dict) -> dict:
+    formulae = list(dict.fromkeys(body.formulae))
+    casks = list(dict.fromkeys(body.casks))
+    if not formulae and not casks:
+        raise HTTPException(status_code=400, detail="No packages given")
+    invalid = [name for name in formulae + casks if not PACKAGE_NAME.match(name)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid package names: {', '.join(invalid)}")
+    
+    groups = []
+    for names, extra in ((formulae, []), (casks, ['--cask'])):
+        if names:
+            for chunk in chunked(names, body.chunk_size or len(names)):
+                groups.append((['brew', action, *extra, *chunk], chunk))
+    commands = [cmd for cmd, _ in groups]
+    job = job_manager.submit(
+        kind,
+        commands,
+        resource="brew",
+        description=f"Batch {action} of {len(formulae) + len(casks)} packages",
+        timeout=per_package_timeout["formula"] * len(formulae) + per_package_timeout["cask"] * len(casks),
+        observer=BrewOutcomeParser([chunk for _, chunk in groups]),
+        on_finish=invalidate_inventory,
+        # Keep going so one bad name doesn't stop the other chunks
+        continue_on_error=True,
+    )
+    return {
+        "success": True,
+        "message": f"{job.description} queued",
+        "job": job.to_dict(),
+    }
+
+@router.post("/batch/install")
+async def batch_install(body: BatchRequest, current_user: dict = Depends(get_current_user)):
+    """Install several formulae and casks with as few brew invocations as possible
+
+    The finished job's ``summary`` maps each package to its outcome:
+    installed, already_installed, not_found, failed, succeeded or skipped.
+    """
+    return queue_batch_job("batch-install", "install", body, {"formula": 300, "cask": 600})
+
+@router.post("/batch/uninstall")
+async def batch_uninstall(body: BatchRequest, current_user: dict = Depends(get_current_user)):
+    """Uninstall several formulae and casks with as few brew invocations as possible"""
+    return queue_batch_job("batch-uninstall", "uninstall", body, {"formula": 60, "cask": 60})
 
 @router.get("/installed")
 async def get_installed_packages(current_user: dict = Depends(get_current_user)):
     """Get list of all installed Homebrew packages"""
     try:
-        # Get formulae
-        returncode1, stdout1, _ = run_command(['brew', 'list', '--formula', '-1'], check=False)
-        formulae = stdout1.strip().split('\n') if returncode1 == 0 and stdout1 else []
-        
-        # Get casks
-        returncode2, stdout2, _ = run_command(['brew', 'list', '--cask', '-1'], check=False)
-        casks = stdout2.strip().split('\n') if returncode2 == 0 and stdout2 else []
+        inventory = await brew_inventory.get()
+        formulae = list(inventory["formulae"])
+        casks = list(inventory["casks"])
         
         return {
             "formulae": formulae,
             "casks": casks,
+            "versions": {**inventory["formulae"], **inventory["casks"]},
+            "requested": inventory["requested"],
             "total_formulae": len(formulae),
             "total_casks": len(casks)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/outdated")
+async def get_outdated(refresh: bool = False, current_user: dict = Depends(get_current_user)):
+    """Outdated formulae and casks from the last background check
+
+    ``refresh=true`` waits for a fresh check, joining one already running.
+    Otherwise only the very first request waits; a failed check is served
+    with its ``error`` until the next scheduled one.
+    """
+    if refresh or brew_outdated.attempted_at is None:
+        return await brew_outdated.refresh()
+    return brew_outdated.snapshot()
+
+@router.post("/upgrade")
+async def upgrade_packages(body: BatchRequest, current_user: dict = Depends(get_current_user)):
+    """Upgrade only the given formulae and casks
+
+    Follows the same job and per-package summary as the batch endpoints.
+    """
+    return queue_batch_job("upgrade", "upgrade", body, {"formula": 300, "cask": 600})
+
 @router.post("/update")
 async def update_brew(current_user: dict = Depends(get_current_user)):
-    """Update Homebrew and all packages"""
-    try:
-        # Update Homebrew itself
-        result1 = subprocess.run(
-            ['brew', 'update'],
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        
-        # Upgrade packages
-        result2 = subprocess.run(
-            ['brew', 'upgrade'],
-            capture_output=True,
-            text=True,
-            timeout=600
-        )
-        
-        return {
-            "success": True,
-            "message": "Homebrew updated successfully",
-            "update_output": result1.stdout,
-            "upgrade_output": result2.stdout
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Update Homebrew and upgrade all packages in the background"""
+    return queue_brew_job(
+        "update",
+        [['brew', 'update'], ['brew', 'upgrade']],
+        "Homebrew update",
+        timeout=720
+    )
 
 @router.post("/cleanup")
 async def cleanup_brew(current_user: dict = Depends(get_current_user)):
-    """Clean up Homebrew cache and old versions"""
-    try:
-        result = subprocess.run(
-            ['brew', 'cleanup'],
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        
-        return {
-            "success": True,
-            "message": "Homebrew cleanup completed",
-            "output": result.stdout,
-            "freed_space": result.stdout
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Clean up Homebrew cache and old versions in the background"""
+    return queue_brew_job(
+        "cleanup",
+        [['brew', 'cleanup']],
+        "Homebrew cleanup",
+        timeout=120
+    )
+
+@router.get("/jobs")
+async def list_jobs(current_user: dict = Depends(get_current_user)):
+    """List retained Homebrew jobs, oldest first"""
+    return [job.to_dict() for job in job_manager.jobs.values()]
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get a job's status and its retained output"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {**job.to_dict(), "events": job.events}
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Cancel a queued or running job"""
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    after: int = 0,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream a job's output as Server-Sent Events
+
+    Each output line is an ``output`` event whose id is its sequence
+    number, so a reconnecting client can pass ``after`` to resume. A final
+    ``status`` event carries the finished job.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        async for event in job.events_after(after):
+            yield f"id: {event['seq']}\nevent: output\ndata: {json.dumps(event)}\n\n"
+        yield f"event: status\ndata: {json.dumps(job.to_dict())}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -0,0 +1,100 @@
+from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import time
+
+import psutil
+
+from app.api.endpoints.auth import get_current_user
+from app.api.endpoints.system import format_metrics, system_info
+from app.core.config import settings
+from app.services.disks import disk_scanner
+from app.services.metrics import metrics_sampler
+from app.services.network import network_monitor
+from app.services.processes import process_table
+
+router = APIRouter()
+
+async def metrics_section() -> tuple[dict, float]:
+    if metrics_sampler.snapshot is None:
+        await asyncio.to_thread(metrics_sampler.get_snapshot)
+    snapshot = metrics_sampler.snapshot
+    return format_metrics(snapshot), snapshot["timestamp"]
+
+async def top_processes_section() -> tuple[list, float]:
+    await process_table.ensure_fresh()
+    rows = [
+        {
+            "pid": row['pid'],
+            "name": row['name'],
+            "cpu_percent": row['cpu_percent'],
+            "memory_percent": row['memory_percent'],
+            "status": row['status'],
+        }
+        for row in process_table.top(20, 'cpu_percent')
+    ]
+    return rows, process_table.timestamp
+
+async def disks_section() -> tuple[dict, float]:
+    root = psutil.disk_usage('/')
+    partitions = await disk_scanner.scan()
+    return {
+        "root": {
+            "total": root.total,
+            "used": root.used,
+            "free": root.free,
+            "percent": root.percent,
+        },
+        "partitions": partitions,
+    }, time.time()
+
+async def network_section() -> tuple[dict, float]:
+    if network_monitor.timestamp is None:
+        await asyncio.to_thread(network_monitor.sample)
+    return {
+        "interfaces": network_monitor.interfaces(),
+        "stats": network_monitor.totals(),
+        "rates": network_monitor.rates_snapshot(),
+    }, network_monitor.timestamp
+
+async def info_section() -> tuple[dict, float]:
+    return await system_info(), time.time()
+
+SECTIONS = {
+    "metrics": metrics_section,
+    "top_processes": top_processes_section,
+    "disks": disks_section,
+    "network": network_section,
+    "info": info_section,
+}
+
+async def collect_section(name: str) -> dict:
+    try:
+        data, timestamp = await asyncio.wait_for(
+            SECTIONS[name](), settings.DASHBOARD_SECTION_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        return {"data": None, "timestamp": None, "error": f"Timed out after {settings.DASHBOARD_SECTION_TIMEOUT}s"}
+    except Exception as e:
+        return {"data": None, "timestamp": None, "error": str(e)}
+    return {"data": data, "timestamp": timestamp, "error": None}
+
+@router.get("")
+async def get_dashboard(
+    include: str = ",".join(SECTIONS),
+    current_user: dict = Depends(get_current_user)
+):
+    """Everything the dashboard needs for first paint in one request
+
+    ``include`` is a comma-separated list of sections. They are collected
+    concurrently from the shared background samplers; a section that fails
+    or times out carries an ``error`` instead of failing the response.
+    """
+    names = list(dict.fromkeys(n.strip() for n in include.split(",") if n.strip()))
+    unknown = [n for n in names if n not in SECTIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown sections: {', '.join(unknown)}; expected {', '.join(SECTIONS)}",
+        )
+    results = await asyncio.gather(*(collect_section(name) for name in names))
+    return {"timestamp": time.time(), **dict(zip(names, results))}
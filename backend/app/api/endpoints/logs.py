@@ -1,30 +1,50 @@
-from fastapi import APIRouter, Depends
-import subprocess
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
 
 from app.api.endpoints.auth import get_current_user
+from app.services.logs import LEVELS, LogQuery, decode_cursor, log_engine, parse_time
 
 router = APIRouter()
 
 @router.get("/")
 async def get_logs(
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=5000),
+    since: str = "1h",
+    until: Optional[str] = None,
+    predicate: Optional[str] = None,
+    subsystem: Optional[str] = None,
+    level: Optional[str] = None,
+    direction: str = Query("tail", pattern="^(tail|forward)$"),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get system logs using log command"""
+    """Query system logs using the log command
+
+    ``since``/``until`` take ISO timestamps or relative offsets like ``15m``.
+    ``direction=tail`` returns the newest ``limit`` entries; ``forward``
+    pages from the start of the window and returns a ``next_cursor``.
+    """
+    skip = 0
+    try:
+        if cursor:
+            query, skip = decode_cursor(cursor)
+        else:
+            if level is not None and level not in LEVELS:
+                raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+            query = LogQuery(
+                since=parse_time(since),
+                until=parse_time(until) if until else None,
+                predicate=predicate,
+                subsystem=subsystem,
+                level=level,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        result = subprocess.run(
-            ['log', 'show', '--last', '1h', '--style', 'compact'],
-            capture_output=True,
-            text=True
-        )
-        
-        lines = result.stdout.strip().split('\n')[-limit:]
-        
-        logs = []
-        for line in lines:
-            if line.strip():
-                logs.append({"message": line})
-        
-        return logs
+        # A cursor always continues a forward page
+        if cursor or direction == "forward":
+            return await log_engine.page(query, limit, skip)
+        return await log_engine.tail(query, limit)
     except Exception as e:
         return {"error": str(e)}
@@ -1,21 +1,145 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import asyncio
 import psutil
+import re
 
 from app.api.endpoints.auth import get_current_user
+from app.services.process_io import DEFAULT_SORT as IO_DEFAULT_SORT, SORT_COLUMNS as IO_SORT_COLUMNS, process_io_sampler
+from app.services.processes import ATTRS, EXTRA_ATTRS, kill_processes, process_table, protected_pids, subtree_pids
 
 router = APIRouter()
 
+class KillRequest(BaseModel):
+    pids: List[int] = []
+    root: Optional[int] = None
+    recursive: bool = False
+    timeout: float = Field(5.0, ge=0, le=60)
+
 @router.get("/")
-async def get_processes(current_user: dict = Depends(get_current_user)):
-    """Get all processes"""
-    processes = []
-    for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'status', 'create_time']):
-        try:
-            pinfo = proc.info
-            processes.append(pinfo)
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            pass
-    return processes
+async def get_processes(
+    response: Response,
+    sort: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+    name: Optional[str] = None,
+    name_regex: Optional[str] = None,
+    user: Optional[str] = None,
+    min_cpu: Optional[float] = None,
+    min_memory: Optional[float] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get processes, optionally filtered, sorted, paged and projected
+
+    ``fields`` is a comma-separated list of columns. The total number of
+    matching processes is returned in the ``X-Total-Count`` header.
+    """
+    columns = ATTRS + EXTRA_ATTRS
+    field_list = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+    for column in (field_list or []) + ([sort] if sort else []):
+        if column not in columns:
+            raise HTTPException(status_code=400, detail=f"Unknown column: {column}")
+    try:
+        pattern = re.compile(name_regex) if name_regex else None
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid name_regex: {e}")
+    
+    await process_table.ensure_fresh()
+    rows, total = await process_table.query(
+        fields=field_list,
+        sort=sort,
+        descending=order == "desc",
+        name=name,
+        name_regex=pattern,
+        user=user,
+        min_cpu=min_cpu,
+        min_memory=min_memory,
+        limit=limit,
+        offset=offset,
+    )
+    response.headers["X-Total-Count"] = str(total)
+    return rows
+
+@router.get("/delta")
+async def get_process_delta(
+    since: int = 0,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get processes added, changed or removed since a table version
+
+    Returns the full table (``full: true``) when ``since`` is 0 or too old.
+    """
+    await process_table.ensure_fresh()
+    return process_table.delta(since)
+
+@router.get("/top")
+async def get_top_processes(
+    sort: str = "cpu_percent",
+    n: int = Query(20, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the top N processes by any column"""
+    if sort not in ATTRS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(ATTRS)}")
+    await process_table.ensure_fresh()
+    return process_table.top(n, sort)
+
+@router.get("/io")
+async def get_process_io(
+    sort: Optional[str] = None,
+    n: int = Query(10, ge=1, le=500),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the top disk/network I/O consumers from the background sampler
+
+    Only a bounded number of processes is inspected per cycle; ``coverage``
+    says how many have been seen so far. Sorts by ``total_rate`` by default,
+    or by ``connections`` where per-process I/O counters aren't available
+    (macOS), which also rejects the rate columns.
+    """
+    sort = sort or IO_DEFAULT_SORT
+    if sort not in IO_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(IO_SORT_COLUMNS)}")
+    return {
+        "processes": process_io_sampler.top(n, sort),
+        "coverage": process_io_sampler.coverage(),
+    }
+
+@router.get("/tree")
+async def get_process_tree(
+    root: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get processes nested by parent, optionally only the subtree under root"""
+    await process_table.ensure_fresh()
+    return process_table.tree(root)
+
+@router.post("/kill")
+async def kill_processes_bulk(body: KillRequest, current_user: dict = Depends(get_current_user)):
+    """Terminate many processes at once, escalating to SIGKILL after a timeout
+
+    Takes explicit ``pids`` and/or a ``root`` PID; with ``recursive`` the
+    root's whole subtree is included. PID 0 and 1, the server and its
+    parents are refused. Returns a result per PID.
+    """
+    protected = await asyncio.to_thread(protected_pids)
+    refused = sorted(protected.intersection(body.pids + ([body.root] if body.root is not None else [])))
+    if refused:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Refusing to kill protected PIDs: {', '.join(map(str, refused))}",
+        )
+    pids = list(body.pids)
+    if body.root is not None:
+        pids += await asyncio.to_thread(subtree_pids, body.root) if body.recursive else [body.root]
+    if not pids:
+        raise HTTPException(status_code=400, detail="No PIDs given")
+    
+    results = await asyncio.to_thread(kill_processes, pids, body.timeout)
+    return {"results": [{"pid": pid, "result": result} for pid, result in results.items()]}
 
 @router.post("/{pid}/kill")
 async def kill_process(pid: int, current_user: dict = Depends(get_current_user)):
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
 import psutil
-import shutil
 
 from app.api.endpoints.auth import get_current_user
+from app.services.disk_analyzer import disk_analyzer
+from app.services.disks import disk_scanner
 
 router = APIRouter()
 
+class AnalyzeRequest(BaseModel):
+    path: str = "/"
+    top: int = Field(20, ge=1, le=500)
+    use_index: bool = True
+
 @router.get("/")
 async def get_storage_info(current_user: dict = Depends(get_current_user)):
     """Get storage information"""
@@ -20,23 +27,55 @@ async def get_storage_info(current_user: dict = Depends(get_current_user)):
 
 @router.get("/disk")
 async def get_disk_partitions(current_user: dict = Depends(get_current_user)):
-    """Get disk partitions"""
-    partitions = psutil.disk_partitions()
-    result = []
-    
-    for partition in partitions:
-        try:
-            usage = psutil.disk_usage(partition.mountpoint)
-            result.append({
-                "device": partition.device,
-                "mountpoint": partition.mountpoint,
-                "fstype": partition.fstype,
-                "total": usage.total,
-                "used": usage.used,
-                "free": usage.free,
-                "percent": usage.percent,
-            })
-        except PermissionError:
-            continue
-    
-    return result
+    """Get disk partitions
+
+    Mounts that don't answer within DISK_USAGE_TIMEOUT are returned with
+    their last known usage and ``stale: true``.
+    """
+    return await disk_scanner.scan()
+
+@router.post("/analyze")
+async def start_analysis(body: AnalyzeRequest, current_user: dict = Depends(get_current_user)):
+    """Start a background directory size scan and return its job
+
+    A scan already running for the same path is returned instead of
+    starting another. Unchanged directories are reused from the index
+    unless ``use_index`` is false.
+    """
+    try:
+        job = disk_analyzer.submit(body.path, top=body.top, use_index=body.use_index)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict(include_result=False)
+
+@router.get("/analyze")
+async def get_analysis(
+    path: str = Query("/"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the most recent completed scan of a path"""
+    job = disk_analyzer.latest(path)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No completed analysis for this path")
+    return job.to_dict()
+
+@router.get("/analyze/jobs")
+async def list_analysis_jobs(current_user: dict = Depends(get_current_user)):
+    """List retained analysis jobs with their progress"""
+    return [job.to_dict(include_result=False) for job in disk_analyzer.jobs.values()]
+
+@router.get("/analyze/jobs/{job_id}")
+async def get_analysis_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get an analysis job's status, progress and, once finished, its result"""
+    job = disk_analyzer.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.delete("/analyze/jobs/{job_id}")
+async def cancel_analysis_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Cancel a running analysis job"""
+    job = disk_analyzer.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict(include_result=False)
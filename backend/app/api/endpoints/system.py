@@ -1,78 +1,105 @@
-from fastapi import APIRouter, Depends
-import psutil
+from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import Optional
+import asyncio
+import math
+import time
 import platform
-import subprocess
 from datetime import datetime
 
 from app.api.endpoints.auth import get_current_user
+from app.core.cache import cached_command, command_cache
+from app.core.commands import CommandCancelled
+from app.core.config import settings
+from app.services.history import metrics_history, parse_duration
+from app.services.metric_store import metric_store
+from app.services.metrics import metrics_sampler
+from app.services.processes import process_table
 
 router = APIRouter()
 
-@router.get("/metrics")
-async def get_system_metrics(current_user: dict = Depends(get_current_user)):
-    """Get real-time system metrics for macOS"""
-    
-    # CPU information
-    cpu_percent = psutil.cpu_percent(interval=1)
-    cpu_count = psutil.cpu_count()
-    
-    # Memory information
-    memory = psutil.virtual_memory()
-    
-    # Disk information
-    disk = psutil.disk_usage('/')
-    
-    # Network information
-    network = psutil.net_io_counters()
-    
+def format_metrics(snapshot: dict) -> dict:
     # Boot time
-    boot_time = datetime.fromtimestamp(psutil.boot_time())
+    boot_time = datetime.fromtimestamp(snapshot["boot_time"])
     uptime = datetime.now() - boot_time
     
     return {
-        "cpu": {
-            "percent": cpu_percent,
-            "count": cpu_count,
-            "count_logical": psutil.cpu_count(logical=True),
-        },
-        "memory": {
-            "total": memory.total,
-            "available": memory.available,
-            "percent": memory.percent,
-            "used": memory.used,
-            "free": memory.free,
-        },
-        "disk": {
-            "total": disk.total,
-            "used": disk.used,
-            "free": disk.free,
-            "percent": disk.percent,
-        },
-        "network": {
-            "bytes_sent": network.bytes_sent,
-            "bytes_recv": network.bytes_recv,
-            "packets_sent": network.packets_sent,
-            "packets_recv": network.packets_recv,
-        },
+        "cpu": snapshot["cpu"],
+        "memory": snapshot["memory"],
+        "disk": snapshot["disk"],
+        "network": snapshot["network"],
         "boot_time": boot_time.isoformat(),
         "uptime": str(uptime).split('.')[0],
+        "timestamp": snapshot["timestamp"],
     }
 
-@router.get("/info")
-async def get_system_info(current_user: dict = Depends(get_current_user)):
-    """Get macOS system information"""
+@router.get("/metrics")
+async def get_system_metrics(current_user: dict = Depends(get_current_user)):
+    """Get real-time system metrics for macOS"""
+    return format_metrics(metrics_sampler.get_snapshot())
+
+@router.get("/metrics/history")
+async def get_metrics_history(
+    metric: str = "cpu",
+    range: str = "1h",
+    step: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get recorded history for one metric, downsampled to ``step``"""
+    try:
+        return metrics_history.query(
+            metric,
+            parse_duration(range),
+            parse_duration(step) if step else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/metrics/archive")
+async def get_metrics_archive(
+    range: str = "24h",
+    end: Optional[float] = None,
+    step: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get persisted metrics for a time range, averaged into ``step`` buckets
+
+    ``end`` is a Unix timestamp and defaults to now. ``step`` is widened
+    when needed to keep the response under METRICS_STORE_MAX_POINTS points.
+    """
+    try:
+        span = parse_duration(range)
+        step_seconds = parse_duration(step) if step else 1
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    end = end or time.time()
+    step_seconds = max(step_seconds, math.ceil(span / settings.METRICS_STORE_MAX_POINTS))
+    points = await asyncio.to_thread(metric_store.query, end - span, end, step_seconds)
+    return {"step": step_seconds, "points": points}
+
+async def system_info(request: Optional[Request] = None) -> dict:
+    """macOS version and hardware details, shared with the dashboard"""
     
     # Get macOS version info
     try:
-        result = subprocess.run(['sw_vers'], capture_output=True, text=True)
-        macos_info = result.stdout
+        _, macos_info, _ = await cached_command(
+            ['sw_vers'], ttl=settings.SYSTEM_INFO_CACHE_TTL, timeout=10, request=request
+        )
+        # A missing command comes back as empty output, not an exception
+        macos_info = macos_info or "Unknown"
+    except CommandCancelled:
+        raise
     except:
         macos_info = "Unknown"
     
     # Get hardware info
     try:
-        result = subprocess.run(['system_profiler', 'SPHardwareDataType'], capture_output=True, text=True)
-        hardware_info = result.stdout
+        _, hardware_info, _ = await cached_command(
+            ['system_profiler', 'SPHardwareDataType'], ttl=settings.SYSTEM_INFO_CACHE_TTL, timeout=60,
+            request=request,
+        )
+        hardware_info = hardware_info or "Unknown"
+    except CommandCancelled:
+        raise
     except:
         hardware_info = "Unknown"
     
@@ -87,24 +114,33 @@ async def get_system_info(current_user: dict = Depends(get_current_user)):
         "hardware_info": hardware_info,
     }
 
+@router.get("/info")
+async def get_system_info(request: Request, current_user: dict = Depends(get_current_user)):
+    """Get macOS system information"""
+    return await system_info(request)
+
+@router.get("/cache")
+async def get_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Get hit/miss counters for the command output cache"""
+    return command_cache.stats()
+
+@router.delete("/cache")
+async def clear_cache(current_user: dict = Depends(get_current_user)):
+    """Drop all cached command output"""
+    command_cache.invalidate()
+    return {"message": "Command cache cleared"}
+
 @router.get("/processes")
 async def get_processes(current_user: dict = Depends(get_current_user)):
     """Get top processes by CPU usage"""
-    processes = []
-    
-    for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'status']):
-        try:
-            pinfo = proc.info
-            processes.append({
-                "pid": pinfo['pid'],
-                "name": pinfo['name'],
-                "cpu_percent": pinfo['cpu_percent'] or 0,
-                "memory_percent": pinfo['memory_percent'] or 0,
-                "status": pinfo['status'],
-            })
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            pass
-    
-    # Sort by CPU usage
-    processes.sort(key=lambda x: x['cpu_percent'], reverse=True)
-    return processes[:20]
+    await process_table.ensure_fresh()
+    return [
+        {
+            "pid": row['pid'],
+            "name": row['name'],
+            "cpu_percent": row['cpu_percent'],
+            "memory_percent": row['memory_percent'],
+            "status": row['status'],
+        }
+        for row in process_table.top(20, 'cpu_percent')
+    ]
@@ -1,30 +1,16 @@
 from fastapi import APIRouter, Depends
-import subprocess
 
 from app.api.endpoints.auth import get_current_user
+from app.services.software_update import software_update_checker
 
 router = APIRouter()
 
 @router.get("/")
 async def check_updates(current_user: dict = Depends(get_current_user)):
-    """Check for macOS software updates"""
-    try:
-        result = subprocess.run(['softwareupdate', '-l'], capture_output=True, text=True)
-        
-        # Parse the output
-        updates = []
-        lines = result.stdout.split('\n')
-        
-        for line in lines:
-            if 'Label:' in line:
-                # Extract update name
-                update_name = line.replace('Label:', '').strip()
-                updates.append({"name": update_name, "size": "Unknown"})
-        
-        return {
-            "available": len(updates) > 0,
-            "updates": updates,
-            "raw_output": result.stdout
-        }
-    except Exception as e:
-        return {"error": str(e), "available": False}
+    """Available macOS software updates from the last background check"""
+    return software_update_checker.snapshot()
+
+@router.post("/refresh")
+async def refresh_updates(current_user: dict = Depends(get_current_user)):
+    """Check for updates now, joining a check already in progress"""
+    return await software_update_checker.refresh()
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends
-import subprocess
 
 from app.api.endpoints.auth import get_current_user
+from app.core.cache import cached_command
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -10,8 +11,10 @@ async def get_users(current_user: dict = Depends(get_current_user)):
     """Get system users"""
     try:
         # Get users from dscl
-        result = subprocess.run(['dscl', '.', 'list', '/Users'], capture_output=True, text=True)
-        users = result.stdout.strip().split('\n')
+        _, stdout, _ = await cached_command(
+            ['dscl', '.', 'list', '/Users'], ttl=settings.USERS_CACHE_TTL, timeout=30
+        )
+        users = stdout.strip().split('\n')
         
         # Filter out system users
         system_users = ['root', 'daemon', 'nobody']
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, system, processes, storage, network, users, updates, logs, brew
+from app.api.endpoints import auth, system, processes, storage, network, users, updates, logs, brew, dashboard
 
 api_router = APIRouter()
 
@@ -15,6 +15,7 @@ api_router.include_router(network.router, prefix="/network", tags=["network"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(updates.router, prefix="/updates", tags=["updates"])
 api_router.include_router(logs.router, prefix="/logs", tags=["logs"])
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
 
 # Homebrew routes
 api_router.include_router(brew.router, prefix="/brew", tags=["homebrew"])
@@ -1,52 +1,219 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import Optional
 import asyncio
 import json
-import psutil
+import re
+
+from app.core.config import settings
+from app.core.security import authenticate_token
+from app.services.log_stream import StreamFilter, StreamLimitReached, Subscriber, log_stream_hub
+from app.services.logs import LEVELS
+from app.services.metrics import metrics_sampler
+from app.services.network import network_monitor
 
 router = APIRouter()
 
+class CloseFrame:
+    """Queued after a client's last message to close the socket once it's sent"""
+
+    def __init__(self, code: int, reason: str = ""):
+        self.code = code
+        # Close reasons are limited to 123 bytes
+        self.reason = reason.encode()[:123].decode(errors="ignore")
+
+class Client:
+    """A connected socket with its own bounded send queue"""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.topics: set[str] = set()
+        self.queue: asyncio.Queue[str | CloseFrame] = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.task: asyncio.Task | None = None
+
+    def send(self, message: str):
+        """Queue a message, dropping the oldest one if the client is behind"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    def close(self, code: int, reason: str = ""):
+        """Close the socket after everything already queued has been sent"""
+        self.send(CloseFrame(code, reason))
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+    def __init__(
+        self,
+        queue_size: int = settings.WS_SEND_QUEUE_SIZE,
+        send_timeout: float = settings.WS_SEND_TIMEOUT,
+    ):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.active_connections: dict[WebSocket, Client] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, topics: tuple = ("metrics",)) -> Client:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = Client(websocket, self.queue_size)
+        client.topics.update(topics)
+        client.task = asyncio.create_task(self._sender(client))
+        self.active_connections[websocket] = client
+        return client
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client and client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    def broadcast(self, message: str, topic: str = "metrics"):
+        """Queue an already encoded message for every subscriber of a topic"""
+        for client in list(self.active_connections.values()):
+            if topic in client.topics:
+                client.send(message)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+    async def _sender(self, client: Client):
+        # Each client drains its own queue, so a slow socket only delays itself
+        try:
+            while True:
+                message = await client.queue.get()
+                if isinstance(message, CloseFrame):
+                    await client.websocket.close(code=message.code, reason=message.reason)
+                    return
+                await asyncio.wait_for(client.websocket.send_text(message), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Stuck or broken client: evict it
+            print(f"WebSocket evicted: {e!r}")
+            self.disconnect(client.websocket)
+            try:
+                await client.websocket.close(code=1011)
+            except Exception:
+                pass
 
 manager = ConnectionManager()
 
+def metrics_message(snapshot: dict) -> str:
+    return json.dumps({
+        "type": "metrics",
+        "timestamp": snapshot["timestamp"],
+        "data": {
+            "cpu": snapshot["cpu"]["percent"],
+            "memory": snapshot["memory"]["percent"],
+            "disk": snapshot["disk"]["percent"],
+        }
+    })
+
+async def publish_metrics():
+    """Encode each sampler tick once and fan it out to every subscriber"""
+    while True:
+        snapshot = await metrics_sampler.wait_for_update()
+        if manager.active_connections:
+            manager.broadcast(metrics_message(snapshot), topic="metrics")
+
+async def publish_network():
+    """Encode each network monitor tick once for every "network" subscriber"""
+    while True:
+        rates = await network_monitor.wait_for_update()
+        if manager.active_connections:
+            manager.broadcast(json.dumps({"type": "network", "data": rates}), topic="network")
+
+TOPICS = {"metrics", "network"}
+
+def websocket_user(websocket: WebSocket, token: Optional[str]) -> Optional[dict]:
+    """Authenticate a socket once at connect from ?token= or the Authorization header
+
+    Browsers can't set headers on a WebSocket, hence the query parameter.
+    """
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer":
+            token = credentials
+    return authenticate_token(token) if token else None
+
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, topics: str = "metrics", token: Optional[str] = None):
+    if websocket_user(websocket, token) is None:
+        await websocket.close(code=1008, reason="Could not validate credentials")
+        return
+    subscribed = tuple(t for t in topics.split(",") if t in TOPICS) or ("metrics",)
+    client = await manager.connect(websocket, topics=subscribed)
+    if "metrics" in subscribed:
+        client.send(metrics_message(metrics_sampler.get_snapshot()))
     try:
+        # Sends happen in the client's sender task; this loop only notices
+        # when the socket goes away
         while True:
-            # Get system metrics
-            cpu = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory().percent
-            disk = psutil.disk_usage('/').percent
-            
-            data = {
-                "type": "metrics",
-                "timestamp": asyncio.get_event_loop().time(),
-                "data": {
-                    "cpu": cpu,
-                    "memory": memory,
-                    "disk": disk,
-                }
-            }
-            
-            await websocket.send_text(json.dumps(data))
-            await asyncio.sleep(5)
-            
+            await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+    finally:
         manager.disconnect(websocket)
+
+async def flush_logs(client: Client, subscriber: Subscriber, interval: float):
+    """Send buffered log lines as one frame every ``interval`` seconds"""
+    while not subscriber.closed:
+        await asyncio.sleep(interval)
+        # While the socket still has frames queued, let lines pile up in the
+        # subscriber's bounded buffer instead, where drops are counted
+        if not client.queue.empty():
+            continue
+        entries, dropped = subscriber.drain()
+        if entries or dropped:
+            client.send(json.dumps({"type": "logs", "entries": entries, "dropped": dropped}))
+    entries, dropped = subscriber.drain()
+    client.send(json.dumps({
+        "type": "logs", "entries": entries, "dropped": dropped,
+        "closed": True, "error": subscriber.error,
+    }))
+    # 1011 Internal Error when the source failed, otherwise a normal close
+    client.close(1011 if subscriber.error else 1000, subscriber.error or "Log stream ended")
+
+@router.websocket("/ws/logs")
+async def log_stream_endpoint(
+    websocket: WebSocket,
+    predicate: Optional[str] = None,
+    subsystem: Optional[str] = None,
+    level: Optional[str] = None,
+    regex: Optional[str] = None,
+    token: Optional[str] = None,
+):
+    """Stream live log lines, filtered and batched on the server"""
+    if websocket_user(websocket, token) is None:
+        await websocket.close(code=1008, reason="Could not validate credentials")
+        return
+    try:
+        pattern = re.compile(regex) if regex else None
+        if level is not None and level not in LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+    except (re.error, ValueError) as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    
+    stream_filter = StreamFilter(predicate=predicate, subsystem=subsystem, level=level)
+    subscriber = Subscriber(regex=pattern, level=level)
+    try:
+        log_stream_hub.subscribe(stream_filter, subscriber)
+    except StreamLimitReached as e:
+        # 1013 Try Again Later
+        await websocket.close(code=1013, reason=str(e))
+        return
+    flusher = None
+    try:
+        client = await manager.connect(websocket, topics=("logs",))
+        flusher = asyncio.create_task(
+            flush_logs(client, subscriber, settings.LOG_STREAM_BATCH_MS / 1000)
+        )
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
+    finally:
+        if flusher is not None:
+            flusher.cancel()
         manager.disconnect(websocket)
+        await log_stream_hub.unsubscribe(stream_filter, subscriber)
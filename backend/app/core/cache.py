@@ -0,0 +1,104 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request
+
+from app.core import commands
+
+
+class CommandCache:
+    """Caches command output with a per-command TTL
+
+    Concurrent misses for the same command share a single subprocess. Only
+    successful runs (returncode 0) are cached. ``runner`` can be swapped for
+    a fake with the same signature as ``run_command`` in tests.
+    """
+
+    def __init__(self, runner: Optional[Callable[..., Awaitable[tuple]]] = None):
+        self.runner = runner
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[tuple, tuple[float, tuple]] = {}
+        self._inflight: dict[tuple, asyncio.Future] = {}
+
+    async def run(
+        self,
+        cmd: list,
+        ttl: float,
+        timeout: Optional[float] = None,
+        request: Optional[Request] = None,
+    ) -> tuple:
+        """Return (returncode, stdout, stderr) for ``cmd``, from cache if fresh
+
+        With ``request``, raises CommandCancelled once its client goes away.
+        The shared run itself carries on so its result still gets cached.
+        """
+        key = tuple(cmd)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fill(key, ttl, timeout))
+            self._inflight[key] = future
+        # Shield the shared run so one caller going away doesn't cancel it
+        # for everyone else waiting on the same command
+        if request is None:
+            return await asyncio.shield(future)
+        shared = asyncio.shield(future)
+        disconnect = asyncio.ensure_future(commands.wait_disconnect(request))
+        try:
+            await asyncio.wait({shared, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            disconnect.cancel()
+        if not shared.done():
+            shared.cancel()
+            raise commands.CommandCancelled(f"{cmd[0]} cancelled: client disconnected")
+        return shared.result()
+
+    async def _fill(self, key: tuple, ttl: float, timeout: Optional[float]) -> tuple:
+        runner = self.runner or commands.run_command
+        try:
+            result = await runner(list(key), timeout=timeout)
+            if result[0] == 0:
+                self._entries[key] = (time.monotonic() + ttl, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, cmd: Optional[list] = None):
+        """Drop one command's cached result, or everything when cmd is None"""
+        if cmd is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(tuple(cmd), None)
+
+    def invalidate_executable(self, executable: str):
+        """Drop every cached result for commands starting with ``executable``"""
+        for key in [k for k in self._entries if k[0] == executable]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+        }
+
+
+command_cache = CommandCache()
+
+
+async def cached_command(
+    cmd: list,
+    ttl: float,
+    timeout: Optional[float] = None,
+    request: Optional[Request] = None,
+) -> tuple:
+    """Run ``cmd`` through the shared command cache"""
+    return await command_cache.run(cmd, ttl=ttl, timeout=timeout, request=request)
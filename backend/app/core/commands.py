@@ -0,0 +1,157 @@
+import asyncio
+import contextlib
+import os
+import signal
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+
+# Maximum number of concurrent processes per command family. The family
+# defaults to the executable name; anything not listed gets DEFAULT_LIMIT.
+FAMILY_LIMITS = {
+    "brew": 2,
+    "softwareupdate": 1,
+    "system_profiler": 2,
+    "log": 4,
+}
+DEFAULT_LIMIT = 8
+
+_semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+class CommandTimeout(Exception):
+    """Raised when a command runs longer than its timeout"""
+
+
+class CommandCancelled(Exception):
+    """Raised when the requesting client disconnects before a command finishes"""
+
+
+def _semaphore(family: str) -> asyncio.Semaphore:
+    if family not in _semaphores:
+        _semaphores[family] = asyncio.Semaphore(FAMILY_LIMITS.get(family, DEFAULT_LIMIT))
+    return _semaphores[family]
+
+
+async def wait_disconnect(request: Request, poll_interval: float = 0.5):
+    """Return once the client behind ``request`` has gone away"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_interval)
+
+
+async def _kill(proc: asyncio.subprocess.Process):
+    if proc.returncode is None:
+        # Commands run in their own process group; killing just the leader
+        # (brew is a shell script) would leave children holding the pipes
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+
+
+async def run_command(
+    cmd: list,
+    timeout: Optional[float] = None,
+    family: Optional[str] = None,
+    request: Optional[Request] = None,
+) -> tuple:
+    """Run a command without blocking the event loop and return its output
+
+    Returns (returncode, stdout, stderr). Raises CommandTimeout when the
+    command exceeds ``timeout`` and CommandCancelled when ``request`` is
+    given and its client goes away; in both cases the process is killed.
+    """
+    async with _semaphore(family or cmd[0]):
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+        except FileNotFoundError:
+            return -1, "", "Command not found"
+
+        communicate = asyncio.ensure_future(proc.communicate())
+        waiters = {communicate}
+        disconnect = None
+        if request is not None:
+            disconnect = asyncio.ensure_future(wait_disconnect(request))
+            waiters.add(disconnect)
+
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if communicate not in done:
+                await _kill(proc)
+                if disconnect is not None and disconnect in done:
+                    raise CommandCancelled(f"{cmd[0]} cancelled: client disconnected")
+                raise CommandTimeout(f"{cmd[0]} timed out after {timeout}s")
+            stdout, stderr = communicate.result()
+        except asyncio.CancelledError:
+            await _kill(proc)
+            raise
+        finally:
+            if disconnect is not None:
+                disconnect.cancel()
+            if not communicate.done():
+                communicate.cancel()
+
+    return (
+        proc.returncode,
+        stdout.decode(errors="replace"),
+        stderr.decode(errors="replace"),
+    )
+
+
+async def _read_line(stream: asyncio.StreamReader, line_limit: int) -> bytes:
+    try:
+        return await stream.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError as e:
+        line = (await stream.read(e.consumed))[:line_limit]
+    # Over-long line: keep the head and discard the rest up to the newline
+    while True:
+        try:
+            await stream.readuntil(b"\n")
+            return line
+        except asyncio.IncompleteReadError:
+            return line
+        except asyncio.LimitOverrunError as e:
+            await stream.read(e.consumed)
+
+
+async def stream_command(
+    cmd: list,
+    family: Optional[str] = None,
+    line_limit: int = 64 * 1024,
+    limited: bool = True,
+) -> AsyncIterator[str]:
+    """Yield a command's stdout line by line without buffering all of it
+
+    Lines longer than ``line_limit`` bytes are truncated. The process is
+    killed as soon as the consumer stops iterating, so callers can break
+    out early once they have what they need. Raises FileNotFoundError when
+    the executable does not exist.
+
+    ``limited=False`` skips the family semaphore, for long-lived streams
+    whose caller caps their number itself; holding a slot for the life of
+    a stream would block everyone else in the family indefinitely.
+    """
+    async with _semaphore(family or cmd[0]) if limited else contextlib.nullcontext():
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=line_limit,
+            start_new_session=True,
+        )
+        try:
+            while True:
+                line = await _read_line(proc.stdout, line_limit)
+                if not line:
+                    break
+                yield line.decode(errors="replace").rstrip("\n")
+        finally:
+            await _kill(proc)
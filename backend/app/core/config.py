@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import List
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -11,13 +11,92 @@ class Settings(BaseSettings):
     # JWT
     JWT_SECRET_KEY: str = "change-this-in-production"
     JWT_ALGORITHM: str = "HS256"
+    # Stays at 30 until the frontend uses /auth/refresh
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    REVOCATION_DB_PATH: str = "data/revoked-tokens.sqlite3"
+    REVOCATION_SWEEP_INTERVAL: float = 3600.0
+    # Extra keys by kid, e.g. '{"2024-06": "..."}'; new tokens use JWT_ACTIVE_KID
+    JWT_SIGNING_KEYS: Dict[str, str] = {}
+    JWT_ACTIVE_KID: Optional[str] = None
+    # Keep accepting kid-less tokens signed with JWT_SECRET_KEY after setting JWT_ACTIVE_KID
+    JWT_ALLOW_LEGACY_TOKENS: bool = False
+    JWT_CACHE_SIZE: int = 1024
     
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:5173"]
     
     # System
     SYSTEM_UPDATE_INTERVAL: int = 5
+    PROCESS_TABLE_HISTORY: int = 60
+    PROCESS_IO_INTERVAL: float = 5.0
+    PROCESS_IO_BUDGET: int = 200
+    METRICS_HISTORY_INTERVAL: int = 1
+    
+    # Network monitor
+    NETWORK_SAMPLE_INTERVAL: float = 2.0
+    NETWORK_RATE_ALPHA: float = 0.3
+    NETWORK_ADDRESS_TTL: float = 60.0
+    
+    # Disk usage scanning
+    DISK_SCAN_WORKERS: int = 4
+    DISK_USAGE_TIMEOUT: float = 2.0
+    DISK_PARTITIONS_TTL: float = 300.0
+    
+    # Directory size analysis
+    STORAGE_SCAN_WORKERS: int = 8
+    STORAGE_INDEX_PATH: str = "data/storage-index.sqlite3"
+    STORAGE_MAX_JOBS: int = 20
+    
+    # On-disk metric history
+    METRICS_STORE_ENABLED: bool = True
+    METRICS_STORE_DIR: str = "data/metrics"
+    METRICS_STORE_FSYNC_INTERVAL: float = 30.0
+    METRICS_STORE_RETENTION_DAYS: int = 180
+    METRICS_STORE_COMPACT_AFTER_DAYS: int = 7
+    METRICS_STORE_COMPACT_STEP: int = 60
+    METRICS_STORE_MAX_POINTS: int = 5000
+    
+    # Command output cache TTLs (seconds)
+    SYSTEM_INFO_CACHE_TTL: int = 3600
+    USERS_CACHE_TTL: int = 300
+    
+    # WebSocket
+    WS_SEND_QUEUE_SIZE: int = 16
+    WS_SEND_TIMEOUT: float = 10.0
+    
+    # Homebrew
+    BREW_INVENTORY_TTL: float = 600.0
+    # Read installed packages straight from the Cellar/Caskroom instead of `brew list`
+    BREW_DIRECT_READ: bool = True
+    # Skip `brew --prefix` when set
+    BREW_PREFIX: Optional[str] = None
+    BREW_OUTDATED_INTERVAL: int = 3600
+    BREW_OUTDATED_TIMEOUT: float = 300.0
+    
+    # macOS software updates
+    SOFTWARE_UPDATE_INTERVAL: int = 21600
+    SOFTWARE_UPDATE_TIMEOUT: float = 300.0
+    
+    # Conditional GET / delta encoding
+    ETAG_ENABLED: bool = True
+    ETAG_DELTA_RESOURCES: int = 256
+    ETAG_DELTA_VERSIONS: int = 4
+    
+    # Dashboard
+    DASHBOARD_SECTION_TIMEOUT: float = 5.0
+    
+    # Background jobs
+    JOBS_MAX_RETAINED: int = 50
+    JOBS_MAX_EVENTS: int = 5000
+    # Longer output lines are truncated
+    JOBS_LINE_LIMIT: int = 64 * 1024
+    
+    # Live log streaming
+    LOG_STREAM_BATCH_MS: int = 250
+    LOG_STREAM_BUFFER_SIZE: int = 1000
+    # Distinct filter sets (one `log stream` process each) at once
+    LOG_STREAM_MAX_STREAMS: int = 8
     
     class Config:
         env_file = ".env"
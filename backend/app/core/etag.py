@@ -0,0 +1,173 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+# RFC 3229 delta encoding: the client asks with "A-IM: json-patch" and
+# gets "226 IM Used" with a JSON Patch against its If-None-Match version
+DELTA_IM = "json-patch"
+
+
+def compute_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def parse_etags(header: str) -> list[str]:
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+def json_patch(old, new) -> Optional[list]:
+    """One-level JSON Patch (RFC 6902) turning ``old`` into ``new``
+
+    Arrays are compared by index and objects by key, replacing whole
+    elements that changed. Returns None when the top-level types differ.
+    """
+    if isinstance(old, list) and isinstance(new, list):
+        ops = [
+            {"op": "replace", "path": f"/{i}", "value": new[i]}
+            for i in range(min(len(old), len(new))) if old[i] != new[i]
+        ]
+        # Remove from the end so earlier indexes stay valid
+        ops.extend({"op": "remove", "path": f"/{i}"} for i in range(len(old) - 1, len(new) - 1, -1))
+        ops.extend({"op": "add", "path": "/-", "value": value} for value in new[len(old):])
+        return ops
+    if isinstance(old, dict) and isinstance(new, dict):
+        def pointer(key: str) -> str:
+            return "/" + key.replace("~", "~0").replace("/", "~1")
+        ops = [{"op": "remove", "path": pointer(k)} for k in old if k not in new]
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": pointer(key), "value": value})
+            elif old[key] != value:
+                ops.append({"op": "replace", "path": pointer(key), "value": value})
+        return ops
+    return None
+
+
+class VersionStore:
+    """The last few response bodies per resource, for computing deltas
+
+    Bodies are kept raw and only parsed when a delta is computed.
+    """
+
+    def __init__(
+        self,
+        max_resources: int = settings.ETAG_DELTA_RESOURCES,
+        versions: int = settings.ETAG_DELTA_VERSIONS,
+    ):
+        self.max_resources = max_resources
+        self.versions = versions
+        self._resources: OrderedDict[str, OrderedDict[str, bytes]] = OrderedDict()
+
+    def put(self, resource: str, etag: str, body: bytes):
+        history = self._resources.get(resource)
+        if history is None:
+            history = self._resources[resource] = OrderedDict()
+            if len(self._resources) > self.max_resources:
+                self._resources.popitem(last=False)
+        else:
+            self._resources.move_to_end(resource)
+        history[etag] = body
+        history.move_to_end(etag)
+        while len(history) > self.versions:
+            history.popitem(last=False)
+
+    def get(self, resource: str, etag: str) -> Optional[bytes]:
+        history = self._resources.get(resource)
+        return history.get(etag) if history is not None else None
+
+
+class ConditionalGetMiddleware:
+    """ETags, 304 Not Modified and optional JSON Patch deltas for JSON GETs
+
+    The ETag is a hash of the response body, so any endpoint gets it
+    without tracking versions itself. Streaming and non-JSON responses
+    pass through untouched.
+    """
+
+    def __init__(self, app, prefix: str = "/api", store: Optional[VersionStore] = None):
+        self.app = app
+        self.prefix = prefix
+        self.store = store or VersionStore()
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(self.prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        if_none_match = parse_etags(headers.get("if-none-match", ""))
+        wants_delta = DELTA_IM in headers.get("a-im", "").replace(" ", "").split(",")
+        resource = scope["path"] + "?" + scope.get("query_string", b"").decode("latin-1")
+
+        start: Optional[dict] = None
+        chunks: list[bytes] = []
+        passthrough = False
+
+        async def buffered_send(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                if message["status"] != 200 or not content_type.startswith(b"application/json"):
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body"):
+                return
+            await self._respond(send, start, b"".join(chunks), resource, if_none_match, wants_delta)
+
+        await self.app(scope, receive, buffered_send)
+
+    async def _respond(self, send, start: dict, body: bytes, resource: str, if_none_match: list, wants_delta: bool):
+        etag = compute_etag(body)
+        base_headers = [
+            (k, v) for k, v in start.get("headers", [])
+            if k.lower() not in (b"content-length", b"etag")
+        ]
+        base_headers.append((b"etag", etag.encode()))
+        # Only clients that ask for deltas cost us the memory for old bodies
+        if wants_delta:
+            self.store.put(resource, etag, body)
+
+        if etag in if_none_match or "*" in if_none_match:
+            await send({"type": "http.response.start", "status": 304, "headers": [
+                (k, v) for k, v in base_headers if k.lower() != b"content-type"
+            ]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        status = 200
+        if wants_delta:
+            for base_etag in if_none_match:
+                base = self.store.get(resource, base_etag)
+                if base is None:
+                    continue
+                patch = json_patch(json.loads(base), json.loads(body))
+                if patch is not None:
+                    delta = json.dumps(patch, separators=(",", ":")).encode()
+                    # Only worth it when smaller than the full document
+                    if len(delta) < len(body):
+                        status, body = 226, delta
+                        base_headers = [(k, v) for k, v in base_headers if k.lower() != b"content-type"]
+                        base_headers.extend([
+                            (b"content-type", b"application/json-patch+json"),
+                            (b"im", DELTA_IM.encode()),
+                            (b"delta-base", base_etag.encode()),
+                        ])
+                break
+
+        base_headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": base_headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+
+class RevocationStore:
+    """Deny-list of token ``jti``s that were revoked before they expired
+
+    Lookups on the request path only touch an in-memory dict. SQLite keeps
+    the list across restarts. Entries are only needed until the token
+    would have expired anyway, so a background sweep drops them after that.
+    """
+
+    def __init__(
+        self,
+        path: str = settings.REVOCATION_DB_PATH,
+        sweep_interval: float = settings.REVOCATION_SWEEP_INTERVAL,
+    ):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._revoked: dict[str, float] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS revoked (jti TEXT PRIMARY KEY, expires REAL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self._revoked
+
+    async def revoke(self, jti: str, expires: float):
+        if expires <= time.time():
+            return
+        # Effective immediately; the commit runs off the event loop
+        self._revoked[jti] = expires
+        await asyncio.to_thread(self._persist, jti, expires)
+
+    def _persist(self, jti: str, expires: float):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO revoked VALUES (?, ?)", (jti, expires))
+            conn.commit()
+
+    def load(self):
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT jti, expires FROM revoked WHERE expires > ?", (time.time(),)
+            ).fetchall()
+        self._revoked.update(rows)
+
+    async def sweep(self):
+        """Forget entries whose tokens have expired"""
+        now = time.time()
+        # Pruned here on the event loop, where revoke() also writes, so a
+        # revocation can't slip in between the copy and the swap
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        await asyncio.to_thread(self._delete_expired, now)
+
+    def _delete_expired(self, now: float):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM revoked WHERE expires <= ?", (now,))
+            conn.commit()
+
+    def stats(self) -> dict:
+        return {"revoked": len(self._revoked)}
+
+    async def start(self):
+        if self._task is not None:
+            return
+        await asyncio.to_thread(self.load)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Revocation sweep error: {e}")
+
+
+revocation_store = RevocationStore()
@@ -0,0 +1,163 @@
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.core.revocation import revocation_store
+
+
+class SigningKeys:
+    """JWT signing keys by ``kid``
+
+    New tokens are signed with the active key and carry its ``kid`` in the
+    header. Any configured key still verifies, so a key can be rotated out
+    by first switching JWT_ACTIVE_KID and dropping the old key once its
+    tokens have expired. Tokens without a ``kid`` are verified with
+    JWT_SECRET_KEY only while no active kid is set, or when
+    JWT_ALLOW_LEGACY_TOKENS opts in for the switch-over; otherwise moving to
+    kid-based keys would never retire the legacy secret.
+    """
+
+    def __init__(
+        self,
+        keys: dict[str, str] = settings.JWT_SIGNING_KEYS,
+        active_kid: Optional[str] = settings.JWT_ACTIVE_KID,
+        default: str = settings.JWT_SECRET_KEY,
+        algorithm: str = settings.JWT_ALGORITHM,
+        allow_legacy: bool = settings.JWT_ALLOW_LEGACY_TOKENS,
+    ):
+        if active_kid is not None and active_kid not in keys:
+            raise ValueError(f"JWT_ACTIVE_KID {active_kid!r} is not in JWT_SIGNING_KEYS")
+        self.keys = keys
+        self.active_kid = active_kid
+        self.default = default
+        self.algorithm = algorithm
+        self.allow_legacy = allow_legacy
+
+    def sign(self, claims: dict) -> str:
+        if self.active_kid is None:
+            return jwt.encode(claims, self.default, algorithm=self.algorithm)
+        return jwt.encode(
+            claims, self.keys[self.active_kid], algorithm=self.algorithm,
+            headers={"kid": self.active_kid},
+        )
+
+    def key_for(self, kid: Optional[str]) -> Optional[str]:
+        if kid is None:
+            if self.active_kid is None or self.allow_legacy:
+                return self.default
+            return None
+        return self.keys.get(kid)
+
+    def verify(self, token: str) -> tuple[Optional[str], dict]:
+        """Check signature and expiry; returns (kid, claims)"""
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.key_for(kid)
+        if key is None:
+            raise JWTError("Token has no kid" if kid is None else f"Unknown signing key {kid!r}")
+        return kid, jwt.decode(token, key, algorithms=[self.algorithm])
+
+
+class TokenVerifier:
+    """Verifies JWTs, remembering tokens that already passed
+
+    Entries are keyed by a SHA-256 of the token, kept in LRU order up to
+    ``max_size`` and dropped once the token's ``exp`` passes, so a repeat
+    request costs a hash and a dict lookup instead of a signature check.
+    Tokens signed with a key that is no longer configured stop verifying
+    even when cached.
+    """
+
+    def __init__(self, keys: SigningKeys, max_size: int = settings.JWT_CACHE_SIZE):
+        self.keys = keys
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[float, Optional[str], dict]] = OrderedDict()
+
+    def verify(self, token: str) -> dict:
+        """Return the token's claims or raise JWTError"""
+        digest = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(digest)
+        if entry is not None:
+            expires, kid, claims = entry
+            if expires > time.time() and self.keys.key_for(kid) is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return claims
+            del self._entries[digest]
+
+        self.misses += 1
+        kid, claims = self.keys.verify(token)
+        expires = claims.get("exp")
+        # Tokens without an expiry are verified every time
+        if isinstance(expires, (int, float)):
+            self._entries[digest] = (expires, kid, claims)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return claims
+
+    def invalidate(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+signing_keys = SigningKeys()
+token_verifier = TokenVerifier(signing_keys)
+
+
+def _create_token(data: dict, token_type: str, expires_delta: timedelta) -> str:
+    to_encode = data.copy()
+    to_encode.update({
+        "exp": datetime.utcnow() + expires_delta,
+        "jti": uuid.uuid4().hex,
+        "type": token_type,
+    })
+    return signing_keys.sign(to_encode)
+
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    if expires_delta is None:
+        expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return _create_token(data, "access", expires_delta)
+
+
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    if expires_delta is None:
+        expires_delta = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    return _create_token(data, "refresh", expires_delta)
+
+
+def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
+    """The token's claims if it is valid, of ``token_type`` and not revoked"""
+    try:
+        claims = token_verifier.verify(token)
+    except JWTError:
+        return None
+    # Tokens from before refresh tokens existed carry no type
+    if claims.get("type", "access") != token_type or claims.get("sub") is None:
+        return None
+    if revocation_store.is_revoked(claims.get("jti")):
+        return None
+    return claims
+
+
+async def revoke_token(claims: dict):
+    jti = claims.get("jti")
+    if jti is not None:
+        await revocation_store.revoke(jti, claims["exp"])
+
+
+def authenticate_token(token: str) -> Optional[dict]:
+    """The user an access token belongs to, or None if it isn't valid"""
+    claims = verify_token(token)
+    if claims is None:
+        return None
+    return {"username": claims["sub"], "role": "admin"}
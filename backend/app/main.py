@@ -1,15 +1,55 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 
+from app.core.commands import CommandCancelled
 from app.core.config import settings
 from app.api.routes import api_router
-from app.api.websocket import websocket_router
+from app.core.etag import ConditionalGetMiddleware
+from app.core.revocation import revocation_store
+from app.api.websocket import router as websocket_router, publish_metrics, publish_network
+from app.services.brew import brew_inventory, brew_outdated
+from app.services.disks import disk_scanner
+from app.services.history import metrics_history
+from app.services.metric_store import metric_store
+from app.services.metrics import metrics_sampler
+from app.services.network import network_monitor
+from app.services.process_io import process_io_sampler
+from app.services.processes import process_table
+from app.services.software_update import software_update_checker
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler"""
+    await revocation_store.start()
+    await metrics_sampler.start()
+    await process_table.start()
+    await process_io_sampler.start()
+    await metrics_history.start()
+    if settings.METRICS_STORE_ENABLED:
+        await metric_store.start()
+    await network_monitor.start()
+    await brew_inventory.start()
+    await brew_outdated.start()
+    await software_update_checker.start()
+    publishers = [
+        asyncio.create_task(publish_metrics()),
+        asyncio.create_task(publish_network()),
+    ]
     yield
+    for publisher in publishers:
+        publisher.cancel()
+    await software_update_checker.stop()
+    await brew_outdated.stop()
+    await network_monitor.stop()
+    disk_scanner.shutdown()
+    await metric_store.stop()
+    await metrics_history.stop()
+    await process_io_sampler.stop()
+    await process_table.stop()
+    await metrics_sampler.stop()
+    await revocation_store.stop()
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -27,7 +67,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "ETag", "IM", "Delta-Base"],
 )
+if settings.ETAG_ENABLED:
+    app.add_middleware(ConditionalGetMiddleware)
+
+@app.exception_handler(CommandCancelled)
+async def command_cancelled(request: Request, exc: CommandCancelled):
+    # Nobody is left to read it; 499 is nginx's "client closed request"
+    return Response(status_code=499)
 
 # Include routers
 app.include_router(api_router, prefix="/api")
@@ -0,0 +1,434 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+import time
+from typing import Optional
+
+from app.core.commands import CommandTimeout, run_command
+from app.core.config import settings
+
+# Formula/cask names and taps ("user/tap/name"); anything starting with "-"
+# would be taken as an option by brew
+PACKAGE_NAME = re.compile(r"^[A-Za-z0-9@+_][A-Za-z0-9@+._/-]*$")
+
+# Lines brew prints that tell us what happened to one package
+_OUTCOME_PATTERNS = [
+    (re.compile(r"/Cellar/([^/\s]+)/[^:\s]+: \d+ files"), "installed"),
+    (re.compile(r"🍺\s+(\S+) was successfully installed"), "installed"),
+    (re.compile(r"Warning: (\S+) [\w.,_-]+ is already installed"), "already_installed"),
+    (re.compile(r"Warning: Cask '([^']+)' is already installed"), "already_installed"),
+    (re.compile(r"Warning: Not upgrading (\S+), the latest version is already installed"), "already_installed"),
+    (re.compile(r"Uninstalling \S*/Cellar/([^/\s]+)/"), "uninstalled"),
+    (re.compile(r"==> Uninstalling Cask (\S+)"), "uninstalled"),
+    (re.compile(r"Error: No available formula with the name \"([^\"]+)\""), "not_found"),
+    (re.compile(r"Error: Cask '([^']+)' is unavailable"), "not_found"),
+    (re.compile(r"Error: No (?:formulae or casks|casks?) found for \"?([^\".\s]+)"), "not_found"),
+    (re.compile(r"Error: No such keg: \S*/Cellar/(\S+)"), "not_installed"),
+    (re.compile(r"Error: Cask '([^']+)' is not installed"), "not_installed"),
+    (re.compile(r"Error: (\S+): "), "failed"),
+]
+
+
+def chunked(names: list, size: int) -> list[list]:
+    return [names[i:i + size] for i in range(0, len(names), size)]
+
+
+class BrewOutcomeParser:
+    """Works out a per-package result from the output of batched brew commands
+
+    ``commands`` maps each command index to the packages it was given.
+    Packages brew said nothing specific about get a result from their
+    command's exit code.
+    """
+
+    def __init__(self, commands: list[list]):
+        self.commands = commands
+        self.outcomes: dict[str, str] = {}
+        self._short = {}
+        for packages in commands:
+            for name in packages:
+                # brew reports tap packages by their short name
+                self._short[name.rsplit("/", 1)[-1].lower()] = name
+
+    def _match(self, reported: str) -> Optional[str]:
+        reported = reported.strip("'\"").lower()
+        return self._short.get(reported) or self._short.get(reported.rsplit("/", 1)[-1])
+
+    def feed(self, command: int, stream: str, line: str):
+        for pattern, outcome in _OUTCOME_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                name = self._match(match.group(1))
+                # The first definite outcome wins; a later generic error
+                # line doesn't override "installed"
+                if name is not None and name not in self.outcomes:
+                    self.outcomes[name] = outcome
+                return
+
+    def summary(self, exit_codes: list) -> dict:
+        results = {}
+        for index, packages in enumerate(self.commands):
+            code = exit_codes[index] if index < len(exit_codes) else None
+            for name in packages:
+                if name in self.outcomes:
+                    results[name] = self.outcomes[name]
+                elif code is None:
+                    results[name] = "skipped"
+                else:
+                    results[name] = "succeeded" if code == 0 else "failed"
+        return results
+
+
+def parse_versions(output: str) -> dict[str, list]:
+    """Parse ``brew list --versions`` output into name -> versions"""
+    result = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if parts:
+            result[parts[0]] = parts[1:]
+    return result
+
+
+class LayoutError(Exception):
+    """The prefix doesn't look like the Homebrew layout we know how to read"""
+
+
+def _version_key(version: str) -> list:
+    # "1.10" sorts after "1.9"
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"[._-]", version)]
+
+
+def _versions(keg: str) -> list:
+    with os.scandir(keg) as entries:
+        names = [e.name for e in entries if e.is_dir() and not e.name.startswith(".")]
+    return sorted(names, key=_version_key)
+
+
+def read_cellar(prefix: str) -> dict:
+    """Installed formulae and casks read straight from a Homebrew prefix
+
+    Formulae live in ``Cellar/<name>/<version>/`` with an
+    ``INSTALL_RECEIPT.json`` per version, casks in
+    ``Caskroom/<token>/<version>/``. Raises LayoutError when the tree
+    doesn't match, so the caller can fall back to ``brew list``.
+    """
+    cellar = os.path.join(prefix, "Cellar")
+    if not os.path.isdir(cellar):
+        raise LayoutError(f"No Cellar under {prefix}")
+
+    formulae = {}
+    requested = []
+    with os.scandir(cellar) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if not entry.is_dir():
+                raise LayoutError(f"Unexpected file in Cellar: {entry.name}")
+            versions = _versions(entry.path)
+            if not versions:
+                # brew leaves these behind briefly mid-install/uninstall
+                raise LayoutError(f"Keg without versions: {entry.name}")
+            formulae[entry.name] = versions
+            try:
+                with open(os.path.join(entry.path, versions[-1], "INSTALL_RECEIPT.json")) as f:
+                    receipt = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if receipt.get("installed_on_request"):
+                requested.append(entry.name)
+
+    casks = {}
+    caskroom = os.path.join(prefix, "Caskroom")
+    # Linux prefixes have no Caskroom at all
+    if os.path.isdir(caskroom):
+        with os.scandir(caskroom) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_dir():
+                    continue
+                versions = _versions(entry.path)
+                if versions:
+                    casks[entry.name] = versions
+
+    return {
+        "formulae": dict(sorted(formulae.items())),
+        "casks": dict(sorted(casks.items())),
+        "requested": sorted(requested),
+    }
+
+
+class BrewInventory:
+    """In-memory snapshot of Homebrew itself and what it has installed
+
+    Reloaded when invalidated (after our own brew jobs), when the Cellar or
+    Caskroom directory mtime changes (packages added or removed outside the
+    app), or after BREW_INVENTORY_TTL. Concurrent reloads share one run.
+
+    brew's path, version and prefix are resolved once and kept until the
+    next invalidation. With ``direct_read`` the package lists come from
+    ``read_cellar`` and ``brew list`` is only used when that fails.
+    """
+
+    def __init__(
+        self,
+        ttl: float = settings.BREW_INVENTORY_TTL,
+        direct_read: bool = settings.BREW_DIRECT_READ,
+        prefix: Optional[str] = settings.BREW_PREFIX,
+    ):
+        self.ttl = ttl
+        self.direct_read = direct_read
+        self.prefix = prefix
+        self.snapshot: Optional[dict] = None
+        self._brew: Optional[dict] = None
+        self._loaded_at = 0.0
+        self._mtimes: Optional[tuple] = None
+        self._loading: Optional[asyncio.Future] = None
+        self._generation = 0
+
+    def invalidate(self):
+        # brew update can change the version, so drop the metadata too
+        self.snapshot = None
+        self._brew = None
+        # A load already in flight read the old state; it mustn't publish it
+        self._generation += 1
+
+    def _dir_mtimes(self, prefix: Optional[str]) -> tuple:
+        if not prefix:
+            return ()
+        mtimes = []
+        for name in ("Cellar", "Caskroom"):
+            try:
+                mtimes.append(os.stat(os.path.join(prefix, name)).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _stale(self) -> bool:
+        if self.snapshot is None or time.monotonic() - self._loaded_at >= self.ttl:
+            return True
+        return self._dir_mtimes(self.snapshot["prefix"]) != self._mtimes
+
+    async def start(self):
+        """Resolve brew and load the first snapshot in the background"""
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+
+    async def get(self) -> dict:
+        # Loops only when a load was invalidated before it finished; one
+        # that completed is served even if it already looks stale again
+        loaded = False
+        while self.snapshot is None or (not loaded and self._stale()):
+            if self._loading is None or self._loading.done():
+                self._loading = asyncio.ensure_future(self._load())
+            loading = self._loading
+            try:
+                await asyncio.shield(loading)
+            finally:
+                if self._loading is loading and loading.done():
+                    self._loading = None
+            loaded = True
+        return self.snapshot
+
+    async def _resolve(self) -> dict:
+        path = shutil.which("brew")
+        brew = {"installed": path is not None, "path": path, "version": None, "prefix": self.prefix}
+        if path is not None:
+            commands = [run_command(['brew', '--version'])]
+            if self.prefix is None:
+                commands.append(run_command(['brew', '--prefix']))
+            results = await asyncio.gather(*commands)
+            version = results[0][1]
+            brew["version"] = version.strip().split('\n')[0] if version else "Unknown"
+            if self.prefix is None:
+                prefix = results[1][1]
+                brew["prefix"] = prefix.strip() if prefix else "/usr/local"
+        elif self.prefix is not None:
+            # A configured prefix is enough to read the Cellar without the CLI
+            brew["installed"] = os.path.isdir(self.prefix)
+        return brew
+
+    async def _list(self) -> dict:
+        (rc1, formulae, _), (rc2, casks, _) = await asyncio.gather(
+            run_command(['brew', 'list', '--formula', '--versions']),
+            run_command(['brew', 'list', '--cask', '--versions']),
+        )
+        return {
+            "formulae": parse_versions(formulae) if rc1 == 0 else {},
+            "casks": parse_versions(casks) if rc2 == 0 else {},
+            "requested": None,
+        }
+
+    async def _load(self):
+        generation = self._generation
+        brew = self._brew
+        if brew is None:
+            brew = await self._resolve()
+        if generation != self._generation:
+            return
+        self._brew = brew
+        snapshot = {**brew, "formulae": {}, "casks": {}, "requested": None, "source": None}
+        # Taken before reading so changes made meanwhile are picked up next
+        # time, and whether or not brew is installed so _stale() compares
+        # like with like
+        mtimes = self._dir_mtimes(brew["prefix"])
+        if brew["installed"]:
+            packages = None
+            if self.direct_read and brew["prefix"]:
+                try:
+                    packages = await asyncio.to_thread(read_cellar, brew["prefix"])
+                    snapshot["source"] = "cellar"
+                except (LayoutError, OSError) as e:
+                    print(f"Brew direct read failed, using brew list: {e}")
+            if packages is None and brew["path"]:
+                packages = await self._list()
+                snapshot["source"] = "cli"
+            if packages is not None:
+                snapshot.update(packages)
+        if generation != self._generation:
+            return
+        self._mtimes = mtimes
+        self.snapshot = snapshot
+        self._loaded_at = time.monotonic()
+
+
+brew_inventory = BrewInventory()
+
+
+def _as_list(value) -> list:
+    # Casks report installed_versions as a plain string on older brews
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def parse_outdated(output: str) -> dict:
+    """Parse ``brew outdated --json=v2`` output"""
+    data = json.loads(output)
+    return {
+        "formulae": [
+            {
+                "name": item["name"],
+                "installed_versions": _as_list(item.get("installed_versions")),
+                "current_version": item.get("current_version"),
+                "pinned": bool(item.get("pinned")),
+                "pinned_version": item.get("pinned_version"),
+            }
+            for item in data.get("formulae", [])
+        ],
+        "casks": [
+            {
+                "name": item["name"],
+                "installed_versions": _as_list(item.get("installed_versions")),
+                "current_version": item.get("current_version"),
+            }
+            for item in data.get("casks", [])
+        ],
+    }
+
+
+class BrewOutdated:
+    """Periodically runs ``brew outdated --json=v2`` and keeps the result
+
+    ``refresh()`` joins a check already in progress rather than starting a
+    second one. ``refresh_soon()`` wakes the loop early, e.g. after an
+    upgrade job finishes. ``checked_at`` is the last successful check and
+    ``attempted_at`` the last one that finished at all.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.BREW_OUTDATED_INTERVAL,
+        timeout: float = settings.BREW_OUTDATED_TIMEOUT,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.result: Optional[dict] = None
+        self.checked_at: Optional[float] = None
+        self.attempted_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self._checking: Optional[asyncio.Future] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def checking(self) -> bool:
+        return self._checking is not None and not self._checking.done()
+
+    def snapshot(self) -> dict:
+        return {
+            **(self.result or {"formulae": [], "casks": []}),
+            "checked_at": self.checked_at,
+            "age": time.time() - self.checked_at if self.checked_at else None,
+            "attempted_at": self.attempted_at,
+            "checking": self.checking,
+            "error": self.error,
+        }
+
+    async def refresh(self) -> dict:
+        if not self.checking:
+            self._checking = asyncio.ensure_future(self._check())
+        await asyncio.shield(self._checking)
+        return self.snapshot()
+
+    def refresh_soon(self):
+        self._wake.set()
+
+    async def _check(self):
+        try:
+            await self._run_outdated()
+        finally:
+            self.attempted_at = time.time()
+
+    async def _run_outdated(self):
+        if shutil.which("brew") is None:
+            self.error = "Homebrew is not installed"
+            return
+        try:
+            returncode, stdout, stderr = await run_command(
+                ['brew', 'outdated', '--json=v2'], timeout=self.timeout, family="brew"
+            )
+        except CommandTimeout as e:
+            self.error = str(e)
+            return
+        if returncode != 0:
+            self.error = stderr.strip() or f"brew outdated exited with {returncode}"
+            return
+        try:
+            self.result = parse_outdated(stdout)
+        except (ValueError, KeyError) as e:
+            self.error = f"Unexpected brew outdated output: {e}"
+            return
+        self.error = None
+        self.checked_at = time.time()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.error = str(e)
+                print(f"Brew outdated check error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+brew_outdated = BrewOutdated()
@@ -0,0 +1,334 @@
+import heapq
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+
+def _disk_size(st: os.stat_result) -> int:
+    # Allocated size like `du`, falling back to the logical size
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+
+class DirectoryIndex:
+    """Persistent per-directory scan results keyed by (inode, mtime)
+
+    A directory's mtime changes when entries are added, removed or renamed,
+    so a matching (inode, mtime) means its listing can be reused. Files
+    rewritten in place don't touch the directory mtime; a full rescan
+    (``use_index=False``) picks those up. Each row records how many of the
+    largest files it kept, so a scan asking for more lists the directory
+    again.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(dirs)")]
+            # Indexes from before top_limit existed can't say how many
+            # files they kept; they're only a cache, so start over
+            if columns and "top_limit" not in columns:
+                self._conn.execute("DROP TABLE dirs")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS dirs ("
+                " path TEXT PRIMARY KEY, inode INTEGER, mtime_ns INTEGER,"
+                " own_size INTEGER, own_files INTEGER, subdirs TEXT, top_files TEXT,"
+                " top_limit INTEGER)"
+            )
+            self._conn.commit()
+
+    def get(self, path: str, inode: int, mtime_ns: int, top: int) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT inode, mtime_ns, own_size, own_files, subdirs, top_files, top_limit"
+                " FROM dirs WHERE path = ?",
+                (path,),
+            ).fetchone()
+        if row is None or row[0] != inode or row[1] != mtime_ns or row[6] < top:
+            return None
+        return row[2], row[3], json.loads(row[4]), json.loads(row[5])[:top]
+
+    def put_many(self, rows: list[tuple]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+
+class ScanCancelled(Exception):
+    """Raised inside a scan when its job has been cancelled"""
+
+
+class DirectoryScan:
+    """Multi-threaded os.scandir walk producing a directory size tree
+
+    Memory grows with the number of directories, not files: each directory
+    keeps its own totals and at most ``top`` of its largest files.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        index: Optional[DirectoryIndex],
+        workers: int = settings.STORAGE_SCAN_WORKERS,
+        top: int = 20,
+        one_filesystem: bool = True,
+    ):
+        self.root = os.path.abspath(root)
+        self.index = index
+        self.workers = workers
+        self.top = top
+        self.one_filesystem = one_filesystem
+        self.cancelled = threading.Event()
+        self.progress = {"directories": 0, "files": 0, "bytes": 0, "reused": 0, "errors": 0}
+        self._dirs: dict[str, list] = {}  # path -> [parent, own_size, own_files]
+        self._top_files: list[tuple[int, str]] = []
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._batch: list[tuple] = []
+        self._device: Optional[int] = None
+
+    def _list(self, path: str) -> tuple[int, int, list, list]:
+        own_size = own_files = 0
+        subdirs = []
+        files: list[tuple[int, str]] = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file(follow_symlinks=False):
+                        size = _disk_size(entry.stat(follow_symlinks=False))
+                        own_size += size
+                        own_files += 1
+                        if len(files) < self.top:
+                            heapq.heappush(files, (size, entry.name))
+                        elif size > files[0][0]:
+                            heapq.heapreplace(files, (size, entry.name))
+                except OSError:
+                    continue
+        return own_size, own_files, subdirs, sorted(files, reverse=True)
+
+    def _visit(self, path: str, parent: Optional[str], st: os.stat_result):
+        cached = self.index.get(path, st.st_ino, st.st_mtime_ns, self.top) if self.index else None
+        if cached is not None:
+            own_size, own_files, subdirs, top_files = cached
+        else:
+            own_size, own_files, subdirs, top_files = self._list(path)
+
+        for name in subdirs:
+            child = os.path.join(path, name)
+            try:
+                child_st = os.stat(child, follow_symlinks=False)
+            except OSError:
+                continue
+            if self.one_filesystem and child_st.st_dev != self._device:
+                continue
+            self._queue.put((child, path, child_st))
+
+        with self._lock:
+            self._dirs[path] = [parent, own_size, own_files]
+            for size, name in top_files:
+                item = (size, os.path.join(path, name))
+                if len(self._top_files) < self.top:
+                    heapq.heappush(self._top_files, item)
+                elif size > self._top_files[0][0]:
+                    heapq.heapreplace(self._top_files, item)
+            self.progress["directories"] += 1
+            self.progress["files"] += own_files
+            self.progress["bytes"] += own_size
+            if cached is not None:
+                self.progress["reused"] += 1
+            elif self.index is not None:
+                self._batch.append((
+                    path, st.st_ino, st.st_mtime_ns, own_size, own_files,
+                    json.dumps(subdirs), json.dumps(top_files), self.top,
+                ))
+                if len(self._batch) >= 1000:
+                    batch, self._batch = self._batch, []
+                    self.index.put_many(batch)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            try:
+                if not self.cancelled.is_set():
+                    self._visit(*item)
+            except Exception as e:
+                # Anything else (e.g. sqlite errors from the index) would
+                # otherwise end this thread and leave items unfinished
+                if not isinstance(e, OSError):
+                    print(f"Disk analyzer error in {item[0]}: {e}")
+                with self._lock:
+                    self.progress["errors"] += 1
+            finally:
+                self._queue.task_done()
+
+    def run(self) -> dict:
+        st = os.stat(self.root)
+        self._device = st.st_dev
+        self._queue.put((self.root, None, st))
+        threads = [
+            threading.Thread(target=self._worker, name="disk-analyzer", daemon=True)
+            for _ in range(self.workers)
+        ]
+        for t in threads:
+            t.start()
+        self._queue.join()
+        for _ in threads:
+            self._queue.put(None)
+        for t in threads:
+            t.join()
+        if self.index is not None and self._batch:
+            try:
+                self.index.put_many(self._batch)
+            except sqlite3.Error as e:
+                # The scan itself succeeded; only the next one loses the reuse
+                print(f"Disk analyzer index write failed: {e}")
+            self._batch = []
+        if self.cancelled.is_set():
+            raise ScanCancelled()
+        return self._summarize()
+
+    def _summarize(self) -> dict:
+        totals = {path: [size, files] for path, (_, size, files) in self._dirs.items()}
+        # Roll sizes up the tree, deepest directories first
+        for path in sorted(self._dirs, key=lambda p: p.count(os.sep), reverse=True):
+            parent = self._dirs[path][0]
+            if parent is not None and parent in totals:
+                totals[parent][0] += totals[path][0]
+                totals[parent][1] += totals[path][1]
+
+        largest = heapq.nlargest(
+            self.top, ((v[0], v[1], p) for p, v in totals.items() if p != self.root)
+        )
+        children = [
+            (totals[p][0], totals[p][1], p)
+            for p, (parent, _, _) in self._dirs.items() if parent == self.root
+        ]
+        root_size, root_files = totals.get(self.root, [0, 0])
+        return {
+            "path": self.root,
+            "size": root_size,
+            "files": root_files,
+            "directories": len(self._dirs),
+            "children": [
+                {"path": p, "size": s, "files": f} for s, f, p in sorted(children, reverse=True)
+            ],
+            "largest_directories": [{"path": p, "size": s, "files": f} for s, f, p in largest],
+            "largest_files": [
+                {"path": p, "size": s} for s, p in sorted(self._top_files, reverse=True)
+            ],
+        }
+
+
+class AnalysisJob:
+    def __init__(self, scan: DirectoryScan):
+        self.id = uuid.uuid4().hex
+        self.scan = scan
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.result: Optional[dict] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            "id": self.id,
+            "path": self.scan.root,
+            "status": self.status,
+            "progress": dict(self.scan.progress),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class DiskAnalyzer:
+    """Runs directory scans as background jobs and keeps their results"""
+
+    def __init__(
+        self,
+        index_path: str = settings.STORAGE_INDEX_PATH,
+        max_jobs: int = settings.STORAGE_MAX_JOBS,
+    ):
+        self.index_path = index_path
+        self.max_jobs = max_jobs
+        self.jobs: OrderedDict[str, AnalysisJob] = OrderedDict()
+        self._index: Optional[DirectoryIndex] = None
+
+    @property
+    def index(self) -> DirectoryIndex:
+        if self._index is None:
+            self._index = DirectoryIndex(self.index_path)
+        return self._index
+
+    def submit(self, path: str, top: int = 20, use_index: bool = True) -> AnalysisJob:
+        """Start scanning ``path`` in the background, reusing a running scan of it"""
+        root = os.path.abspath(path)
+        if not os.path.isdir(root):
+            raise ValueError(f"Not a directory: {path}")
+        for job in self.jobs.values():
+            if job.scan.root == root and job.status in ("pending", "running"):
+                return job
+
+        job = AnalysisJob(DirectoryScan(root, self.index if use_index else None, top=top))
+        self.jobs[job.id] = job
+        self._trim()
+        threading.Thread(target=self._run, args=(job,), name="disk-analyzer-job", daemon=True).start()
+        return job
+
+    def _run(self, job: AnalysisJob):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = job.scan.run()
+            job.status = "completed"
+        except ScanCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        job.finished_at = time.time()
+
+    def cancel(self, job_id: str) -> Optional[AnalysisJob]:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.scan.cancelled.set()
+        return job
+
+    def latest(self, path: str) -> Optional[AnalysisJob]:
+        """The most recent completed scan of ``path``"""
+        root = os.path.abspath(path)
+        for job in reversed(self.jobs.values()):
+            if job.scan.root == root and job.status == "completed":
+                return job
+        return None
+
+    def _trim(self):
+        # Drop the oldest finished jobs beyond the retention limit
+        finished = [j for j in self.jobs.values() if j.status not in ("pending", "running")]
+        while len(self.jobs) > self.max_jobs and finished:
+            del self.jobs[finished.pop(0).id]
+
+
+disk_analyzer = DiskAnalyzer()
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import psutil
+
+from app.core.config import settings
+
+# Where mount/unmount shows up cheaply: macOS creates and removes mount
+# points under /Volumes, Linux exposes the live table in /proc
+_VOLUMES_DIR = "/Volumes"
+_PROC_MOUNTS = "/proc/self/mounts"
+
+# Filesystems that can hang on a dead server; probed on their own workers
+NETWORK_FSTYPES = {"smbfs", "nfs", "nfs4", "afpfs", "webdav", "cifs", "smb3", "fuse.sshfs"}
+
+
+def mount_table_fingerprint() -> tuple:
+    """Cheap value that changes whenever something is mounted or unmounted"""
+    volumes = None
+    try:
+        volumes = os.stat(_VOLUMES_DIR).st_mtime_ns
+    except OSError:
+        pass
+    mounts = None
+    try:
+        with open(_PROC_MOUNTS, "rb") as f:
+            mounts = hashlib.md5(f.read()).hexdigest()
+    except OSError:
+        pass
+    return volumes, mounts
+
+
+class DiskScanner:
+    """Collects per-mount usage in parallel with a timeout per mount
+
+    A mount that does not answer in time (a hung SMB/NFS/AFP share) is
+    served from its last known usage and marked ``stale``. Only one probe
+    per mount is ever outstanding, so a hung mount ties up one worker
+    thread instead of a new one per request. Network mounts get their own
+    workers, so enough hung shares can't starve the local disks.
+    ``updated_at`` is when the usage last changed, which keeps the
+    response (and its ETag) stable while nothing does.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.DISK_SCAN_WORKERS,
+        timeout: float = settings.DISK_USAGE_TIMEOUT,
+        partitions_ttl: float = settings.DISK_PARTITIONS_TTL,
+    ):
+        self.timeout = timeout
+        self.partitions_ttl = partitions_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="disk-usage")
+        self._network_executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="disk-usage-network"
+        )
+        self._partitions: list = []
+        self._fingerprint: Optional[tuple] = None
+        self._partitions_at = 0.0
+        self._pending: dict[str, Future] = {}
+        self._usage: dict[str, tuple[float, object]] = {}
+
+    def partitions(self) -> list:
+        """Mounted partitions, re-read only when the mount table changes"""
+        fingerprint = mount_table_fingerprint()
+        now = time.monotonic()
+        if (
+            fingerprint != self._fingerprint
+            or now - self._partitions_at >= self.partitions_ttl
+        ):
+            self._partitions = psutil.disk_partitions()
+            self._fingerprint = fingerprint
+            self._partitions_at = now
+            mounted = {p.mountpoint for p in self._partitions}
+            for mountpoint in [m for m in self._usage if m not in mounted]:
+                del self._usage[mountpoint]
+        return self._partitions
+
+    def _keep(self, mountpoint: str, future: Future):
+        """Cache a finished probe's answer, even one that came in too late"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._store(mountpoint, getattr(future, "finished_at", time.time()), future.result())
+
+    def _store(self, mountpoint: str, at: float, usage):
+        cached = self._usage.get(mountpoint)
+        if cached is None or (cached[0] < at and cached[1] != usage):
+            self._usage[mountpoint] = (at, usage)
+
+    def _probe(self, mountpoint: str, fstype: str) -> Future:
+        future = self._pending.get(mountpoint)
+        if future is None or future.done():
+            if future is not None:
+                self._keep(mountpoint, future)
+            executor = self._network_executor if fstype.lower() in NETWORK_FSTYPES else self._executor
+            future = executor.submit(psutil.disk_usage, mountpoint)
+            # Stamp when the answer arrived; a late one is kept by _keep
+            future.add_done_callback(lambda f: setattr(f, "finished_at", time.time()))
+            self._pending[mountpoint] = future
+        return future
+
+    async def scan(self) -> list[dict]:
+        partitions = self.partitions()
+        futures = {p.mountpoint: asyncio.wrap_future(self._probe(p.mountpoint, p.fstype)) for p in partitions}
+        if futures:
+            # Shield so the timeout doesn't cancel probes still running;
+            # a late answer still lands in the cache for the next request
+            await asyncio.wait(
+                [asyncio.shield(f) for f in futures.values()], timeout=self.timeout
+            )
+
+        result = []
+        now = time.time()
+        for partition in partitions:
+            future = futures[partition.mountpoint]
+            stale = True
+            if future.done():
+                error = future.exception()
+                if isinstance(error, PermissionError):
+                    continue
+                if error is None:
+                    self._store(partition.mountpoint, now, future.result())
+                    stale = False
+                else:
+                    print(f"Disk usage error for {partition.mountpoint}: {error}")
+            cached = self._usage.get(partition.mountpoint)
+            usage = cached[1] if cached else None
+            result.append({
+                "device": partition.device,
+                "mountpoint": partition.mountpoint,
+                "fstype": partition.fstype,
+                "total": usage.total if usage else None,
+                "used": usage.used if usage else None,
+                "free": usage.free if usage else None,
+                "percent": usage.percent if usage else None,
+                "stale": stale,
+                "updated_at": cached[0] if cached else None,
+            })
+        return result
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._network_executor.shutdown(wait=False, cancel_futures=True)
+
+
+disk_scanner = DiskScanner()
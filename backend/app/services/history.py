@@ -0,0 +1,217 @@
+import asyncio
+import math
+import re
+import time
+from array import array
+from typing import Optional
+
+import psutil
+
+from app.core.config import settings
+
+METRICS = ["cpu", "memory", "disk", "net_sent", "net_recv"]
+
+# (step seconds, number of slots): 1s for 10 minutes, 10s for 6 hours,
+# 1m for 7 days
+TIERS = [(1, 600), (10, 2160), (60, 10080)]
+
+_DURATION = re.compile(r"^(\d+)([smhd])$")
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(value: str) -> int:
+    """Parse ``30s`` / ``10m`` / ``6h`` / ``7d`` into seconds"""
+    match = _DURATION.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid duration: {value}")
+    amount, unit = match.groups()
+    return int(amount) * _DURATION_UNITS[unit]
+
+
+class Tier:
+    """Fixed-size ring of pre-aggregated buckets for every metric
+
+    Memory is allocated up front: one timestamp array plus avg/min/max
+    arrays per metric, each ``size`` doubles long.
+    """
+
+    def __init__(self, step: int, size: int):
+        self.step = step
+        self.size = size
+        self.head = 0
+        self.count = 0
+        self.timestamps = array('d', [math.nan]) * size
+        self.avg = {m: array('d', [math.nan]) * size for m in METRICS}
+        self.min = {m: array('d', [math.nan]) * size for m in METRICS}
+        self.max = {m: array('d', [math.nan]) * size for m in METRICS}
+        # Running aggregate for the bucket currently being filled
+        self._bucket: Optional[int] = None
+        self._sum = dict.fromkeys(METRICS, 0.0)
+        self._lo = dict.fromkeys(METRICS, math.inf)
+        self._hi = dict.fromkeys(METRICS, -math.inf)
+        self._n = 0
+
+    @property
+    def span(self) -> int:
+        return self.step * self.size
+
+    def add(self, timestamp: float, values: dict):
+        bucket = int(timestamp // self.step)
+        if self._bucket is not None and bucket != self._bucket:
+            self._commit()
+        self._bucket = bucket
+        for m in METRICS:
+            v = values[m]
+            self._sum[m] += v
+            self._lo[m] = min(self._lo[m], v)
+            self._hi[m] = max(self._hi[m], v)
+        self._n += 1
+
+    def _commit(self):
+        i = self.head
+        self.timestamps[i] = self._bucket * self.step
+        for m in METRICS:
+            self.avg[m][i] = self._sum[m] / self._n
+            self.min[m][i] = self._lo[m]
+            self.max[m][i] = self._hi[m]
+            self._sum[m] = 0.0
+            self._lo[m] = math.inf
+            self._hi[m] = -math.inf
+        self._n = 0
+        self.head = (i + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def points(self, metric: str, start: float) -> list[tuple]:
+        """Committed (timestamp, avg, min, max) at or after ``start``, oldest first"""
+        out = []
+        for k in range(1, self.count + 1):
+            i = (self.head - k) % self.size
+            ts = self.timestamps[i]
+            if ts < start:
+                break
+            out.append((ts, self.avg[metric][i], self.min[metric][i], self.max[metric][i]))
+        out.reverse()
+        return out
+
+
+class MetricsHistory:
+    """In-process metric history at several resolutions, bounded in memory"""
+
+    def __init__(self, interval: float = settings.METRICS_HISTORY_INTERVAL, tiers=TIERS):
+        self.interval = interval
+        self.tiers = [Tier(step, size) for step, size in tiers]
+        self._task: Optional[asyncio.Task] = None
+        self._last_cpu: Optional[tuple] = None
+        self._last_net: Optional[tuple] = None
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the ring buffers, fixed at construction"""
+        slots = sum(t.size for t in self.tiers)
+        return slots * 8 * (1 + 3 * len(METRICS))
+
+    def _cpu_percent(self) -> float:
+        # Computed from our own cpu_times deltas so we don't disturb the
+        # module-level state psutil.cpu_percent(interval=None) keeps for
+        # the metrics sampler
+        times = psutil.cpu_times()
+        total = sum(times)
+        idle = times.idle + getattr(times, 'iowait', 0)
+        last, self._last_cpu = self._last_cpu, (total, idle)
+        if last is None or total <= last[0]:
+            return 0.0
+        busy = (total - last[0]) - (idle - last[1])
+        return max(0.0, min(100.0, 100.0 * busy / (total - last[0])))
+
+    def collect(self) -> tuple[float, dict]:
+        now = time.time()
+        network = psutil.net_io_counters()
+        last, self._last_net = self._last_net, (now, network.bytes_sent, network.bytes_recv)
+        if last is None or now <= last[0]:
+            sent = recv = 0.0
+        else:
+            elapsed = now - last[0]
+            sent = max(0, network.bytes_sent - last[1]) / elapsed
+            recv = max(0, network.bytes_recv - last[2]) / elapsed
+        return now, {
+            "cpu": self._cpu_percent(),
+            "memory": psutil.virtual_memory().percent,
+            "disk": psutil.disk_usage('/').percent,
+            "net_sent": sent,
+            "net_recv": recv,
+        }
+
+    def record(self, timestamp: float, values: dict):
+        for tier in self.tiers:
+            tier.add(timestamp, values)
+
+    def query(self, metric: str, range_seconds: int, step: Optional[int] = None) -> dict:
+        """Points for ``metric`` over the last ``range_seconds``
+
+        Without ``step`` the finest tier covering the range is used. With
+        one, the coarsest covering tier whose step fits, so as few stored
+        buckets as possible are merged up to ``step``.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+        covering = [t for t in self.tiers if t.span >= range_seconds] or self.tiers[-1:]
+        fitting = [t for t in covering if step and t.step <= step]
+        tier = fitting[-1] if fitting else covering[0]
+        step = max(step or 0, tier.step)
+
+        start = time.time() - range_seconds
+        points = tier.points(metric, start)
+        if step > tier.step:
+            points = _rebucket(points, step)
+        return {
+            "metric": metric,
+            "step": step,
+            "tier_step": tier.step,
+            "points": [
+                {"timestamp": ts, "avg": avg, "min": lo, "max": hi}
+                for ts, avg, lo, hi in points
+            ],
+        }
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self.collect()  # prime the CPU and network deltas
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                timestamp, values = await asyncio.to_thread(self.collect)
+                self.record(timestamp, values)
+            except Exception as e:
+                print(f"Metrics history error: {e}")
+
+
+def _rebucket(points: list[tuple], step: int) -> list[tuple]:
+    merged = []
+    bucket = None
+    for ts, avg, lo, hi in points:
+        b = int(ts // step)
+        if b != bucket:
+            merged.append([b * step, 0.0, math.inf, -math.inf, 0])
+            bucket = b
+        cur = merged[-1]
+        cur[1] += avg
+        cur[2] = min(cur[2], lo)
+        cur[3] = max(cur[3], hi)
+        cur[4] += 1
+    return [(ts, total / n, lo, hi) for ts, total, lo, hi, n in merged]
+
+
+metrics_history = MetricsHistory()
@@ -0,0 +1,276 @@
+import asyncio
+import os
+import signal
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Optional, Protocol
+
+from app.core.config import settings
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class OutputObserver(Protocol):
+    """Sees every output line as it arrives and summarizes the job at the end"""
+
+    def feed(self, command: int, stream: str, line: str): ...
+
+    def summary(self, exit_codes: list) -> dict: ...
+
+
+class Job:
+    """One queued command sequence with its streamed output"""
+
+    def __init__(
+        self,
+        kind: str,
+        commands: list[list],
+        resource: str,
+        timeout: Optional[float],
+        description: str,
+        on_finish: Optional[Callable[["Job"], None]] = None,
+        observer: Optional[OutputObserver] = None,
+        continue_on_error: bool = False,
+        max_events: int = settings.JOBS_MAX_EVENTS,
+    ):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.commands = commands
+        self.resource = resource
+        self.timeout = timeout
+        self.description = description
+        self.on_finish = on_finish
+        self.observer = observer
+        self.continue_on_error = continue_on_error
+        self.status = "queued"
+        self.returncode: Optional[int] = None
+        self.exit_codes: list[int] = []
+        self.summary: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Output events, numbered so clients can resume with ?after=<seq>.
+        # Only the newest max_events are kept.
+        self.events: list[dict] = []
+        self.max_events = max_events
+        self._seq = 0
+        self._command = 0
+        self._changed = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+        self._proc: Optional[asyncio.subprocess.Process] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "description": self.description,
+            "status": self.status,
+            "returncode": self.returncode,
+            "exit_codes": self.exit_codes,
+            "summary": self.summary,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "last_seq": self._seq,
+        }
+
+    async def _emit(self, stream: str, line: str):
+        self._seq += 1
+        self.events.append({"seq": self._seq, "command": self._command, "stream": stream, "line": line})
+        if self.observer is not None and stream != "meta":
+            self.observer.feed(self._command, stream, line)
+        if len(self.events) > self.max_events:
+            del self.events[: len(self.events) - self.max_events]
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _set_status(self, status: str):
+        self.status = status
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def events_after(self, seq: int = 0) -> AsyncIterator[dict]:
+        """Yield output events after ``seq``, then follow until the job ends"""
+        while True:
+            pending = [e for e in self.events if e["seq"] > seq]
+            for event in pending:
+                seq = event["seq"]
+                yield event
+            if self.finished and seq >= self._seq:
+                return
+            async with self._changed:
+                if not (self._seq > seq or self.finished):
+                    await self._changed.wait()
+
+
+async def read_lines(stream: asyncio.StreamReader, line_limit: int) -> AsyncIterator[str]:
+    """Yield output lines, collapsing \r progress redraws to their last state
+
+    Lines are split on \n; within a line only the text after the last \r
+    is kept, and anything past ``line_limit`` bytes is dropped, so a long
+    progress bar never builds up an unbounded buffer.
+    """
+    pending = b""
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            break
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for raw in lines:
+            yield raw.rstrip(b"\r").rsplit(b"\r", 1)[-1][:line_limit].decode(errors="replace")
+        if b"\r" in pending.rstrip(b"\r"):
+            pending = pending.rstrip(b"\r").rsplit(b"\r", 1)[-1]
+        pending = pending[:line_limit]
+    if pending:
+        yield pending.rstrip(b"\r").rsplit(b"\r", 1)[-1].decode(errors="replace")
+
+
+class JobManager:
+    """Runs long commands in the background, one at a time per resource"""
+
+    def __init__(
+        self,
+        max_retained: int = settings.JOBS_MAX_RETAINED,
+        line_limit: int = settings.JOBS_LINE_LIMIT,
+    ):
+        self.max_retained = max_retained
+        self.line_limit = line_limit
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def submit(
+        self,
+        kind: str,
+        commands: list[list],
+        resource: str,
+        description: str,
+        timeout: Optional[float] = None,
+        on_finish: Optional[Callable[[Job], None]] = None,
+        observer: Optional[OutputObserver] = None,
+        continue_on_error: bool = False,
+    ) -> Job:
+        """Queue ``commands``; an identical unfinished job is returned instead
+
+        Commands run in order and stop at the first failure unless
+        ``continue_on_error`` is set.
+        """
+        for job in self.jobs.values():
+            if not job.finished and job.commands == commands:
+                return job
+        job = Job(
+            kind, commands, resource, timeout, description,
+            on_finish=on_finish, observer=observer, continue_on_error=continue_on_error,
+        )
+        self.jobs[job.id] = job
+        self._trim()
+        job._task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._task.cancel()
+        try:
+            await job._task
+        except asyncio.CancelledError:
+            pass
+        return job
+
+    def _trim(self):
+        finished = [j for j in self.jobs.values() if j.finished]
+        while len(self.jobs) > self.max_retained and finished:
+            del self.jobs[finished.pop(0).id]
+
+    async def _run(self, job: Job):
+        lock = self._locks.setdefault(job.resource, asyncio.Lock())
+        try:
+            async with lock:
+                job.started_at = time.time()
+                await job._set_status("running")
+                deadline = job.started_at + job.timeout if job.timeout else None
+                try:
+                    for index, cmd in enumerate(job.commands):
+                        job._command = index
+                        await job._emit("meta", "$ " + " ".join(cmd))
+                        remaining = deadline - time.time() if deadline else None
+                        code = await asyncio.wait_for(self._exec(job, cmd), remaining)
+                        job.exit_codes.append(code)
+                        if code != 0 and not job.continue_on_error:
+                            break
+                finally:
+                    # Never release the resource with a process still running
+                    await self._kill(job)
+                # Overall result is the first failure, if any
+                job.returncode = next((c for c in job.exit_codes if c != 0), 0)
+            await self._finish(job, "succeeded" if job.returncode == 0 else "failed")
+        except asyncio.TimeoutError:
+            job.error = f"Timed out after {job.timeout}s"
+            await self._finish(job, "failed")
+        except asyncio.CancelledError:
+            await self._finish(job, "cancelled")
+        except Exception as e:
+            job.error = str(e)
+            await self._finish(job, "failed")
+
+    async def _finish(self, job: Job, status: str):
+        job.finished_at = time.time()
+        if job.observer is not None:
+            try:
+                job.summary = job.observer.summary(job.exit_codes)
+            except Exception as e:
+                print(f"Job summary error: {e}")
+        # Run hooks before announcing the final status, so anyone woken by
+        # it already sees their effects
+        if job.on_finish is not None:
+            try:
+                job.on_finish(job)
+            except Exception as e:
+                print(f"Job hook error: {e}")
+        await job._set_status(status)
+
+    async def _exec(self, job: Job, cmd: list) -> int:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                # Own process group, so _kill also reaches whatever it spawns
+                start_new_session=True,
+            )
+        except FileNotFoundError:
+            await job._emit("stderr", f"{cmd[0]}: command not found")
+            return -1
+        job._proc = proc
+
+        async def pump(stream: asyncio.StreamReader, name: str):
+            async for line in read_lines(stream, self.line_limit):
+                await job._emit(name, line)
+
+        await asyncio.gather(pump(proc.stdout, "stdout"), pump(proc.stderr, "stderr"))
+        return await proc.wait()
+
+    async def _kill(self, job: Job):
+        proc, job._proc = job._proc, None
+        if proc is not None and proc.returncode is None:
+            # brew is a shell script; killing only it would leave its child
+            # holding the output pipes open
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+
+job_manager = JobManager()
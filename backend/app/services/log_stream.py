@@ -0,0 +1,201 @@
+import asyncio
+import json
+import re
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Optional
+
+from app.core.commands import stream_command
+from app.core.config import settings
+from app.services.logs import LEVELS, parse_line
+
+
+@dataclass(frozen=True)
+class StreamFilter:
+    """Filters pushed down into `log stream`; one process is shared per value"""
+    predicate: Optional[str] = None
+    subsystem: Optional[str] = None
+    level: Optional[str] = None
+
+
+StreamSource = Callable[[StreamFilter], AsyncIterator[str]]
+
+
+def build_stream_args(stream_filter: StreamFilter) -> list:
+    """Build the `log stream` invocation for a filter set"""
+    args = ["log", "stream", "--style", "compact"]
+    level = stream_filter.level
+    # `log stream --level` only knows default/info/debug; stricter levels
+    # are expressed in the predicate
+    if level in ("debug", "info"):
+        args += ["--level", level]
+    clauses = []
+    if stream_filter.predicate:
+        clauses.append(f"({stream_filter.predicate})")
+    if stream_filter.subsystem:
+        clauses.append(f"subsystem == {json.dumps(stream_filter.subsystem)}")
+    if level in ("error", "fault"):
+        wanted = LEVELS[LEVELS.index(level):]
+        clauses.append("(" + " OR ".join(f"messageType == {lvl}" for lvl in wanted) + ")")
+    if clauses:
+        args += ["--predicate", " AND ".join(clauses)]
+    return args
+
+
+def command_stream_source(stream_filter: StreamFilter) -> AsyncIterator[str]:
+    """Follow the macOS unified log with `log stream`"""
+    # Not counted against the `log` family; LogStreamHub caps streams itself
+    return stream_command(build_stream_args(stream_filter), limited=False)
+
+
+def file_stream_source(path: str, poll_interval: float = 0.2) -> StreamSource:
+    """Build a source that follows a compact-style log file like `tail -f`
+
+    Stands in for `log stream` on machines without the macOS log tool.
+    """
+    async def source(stream_filter: StreamFilter) -> AsyncIterator[str]:
+        with open(path, errors="replace") as f:
+            while True:
+                line = f.readline()
+                if not line:
+                    await asyncio.sleep(poll_interval)
+                    continue
+                yield line.rstrip("\n")
+    return source
+
+
+class Subscriber:
+    """One consumer of a stream, with its own regex/level filter and buffer"""
+
+    def __init__(
+        self,
+        regex: Optional[re.Pattern] = None,
+        level: Optional[str] = None,
+        buffer_size: int = settings.LOG_STREAM_BUFFER_SIZE,
+    ):
+        self.regex = regex
+        self.min_level = LEVELS.index(level) if level else None
+        self.buffer: deque[dict] = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.closed = False
+        self.error: Optional[str] = None
+
+    def matches(self, entry: dict) -> bool:
+        if self.min_level is not None and entry["level"] is not None:
+            if LEVELS.index(entry["level"]) < self.min_level:
+                return False
+        if self.regex is not None and not self.regex.search(entry["message"]):
+            return False
+        return True
+
+    def offer(self, entry: dict):
+        """Buffer an entry, dropping the oldest one if the consumer is behind"""
+        if not self.matches(entry):
+            return
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(entry)
+
+    def drain(self) -> tuple[list, int]:
+        """Take everything buffered plus the number of lines dropped since last time"""
+        entries = list(self.buffer)
+        self.buffer.clear()
+        dropped, self.dropped = self.dropped, 0
+        return entries, dropped
+
+
+class LogStream:
+    """A single source process fanned out to every subscriber of a filter set"""
+
+    def __init__(self, stream_filter: StreamFilter, source: StreamSource):
+        self.filter = stream_filter
+        self.source = source
+        self.subscribers: set[Subscriber] = set()
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self._task is not None and self._task.done()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        try:
+            async with aclosing(self.source(self.filter)) as lines:
+                async for line in lines:
+                    entry = parse_line(line)
+                    if entry is None:
+                        continue
+                    for subscriber in self.subscribers:
+                        subscriber.offer(entry)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = str(e)
+            print(f"Log stream error: {e}")
+        # Source ended; let subscribers know there is nothing more coming
+        for subscriber in self.subscribers:
+            subscriber.error = self.error
+            subscriber.closed = True
+
+
+class StreamLimitReached(Exception):
+    """Raised when a new filter set would need more than the allowed streams"""
+
+
+class LogStreamHub:
+    """Keeps one LogStream per distinct filter set while it has subscribers
+
+    At most ``max_streams`` source processes run at once. Subscribing to an
+    existing filter set always works; a new one beyond the limit raises
+    StreamLimitReached instead of waiting for a slot.
+    """
+
+    def __init__(
+        self,
+        source: StreamSource = command_stream_source,
+        max_streams: int = settings.LOG_STREAM_MAX_STREAMS,
+    ):
+        self.source = source
+        self.max_streams = max_streams
+        self.streams: dict[StreamFilter, LogStream] = {}
+
+    def subscribe(self, stream_filter: StreamFilter, subscriber: Subscriber) -> LogStream:
+        stream = self.streams.get(stream_filter)
+        if stream is None or stream.done:
+            running = sum(1 for s in self.streams.values() if not s.done)
+            if running >= self.max_streams:
+                raise StreamLimitReached(
+                    f"Too many live log streams ({self.max_streams}); "
+                    "reuse an existing filter or try again later"
+                )
+            stream = LogStream(stream_filter, self.source)
+            self.streams[stream_filter] = stream
+            stream.start()
+        stream.subscribers.add(subscriber)
+        return stream
+
+    async def unsubscribe(self, stream_filter: StreamFilter, subscriber: Subscriber):
+        stream = self.streams.get(stream_filter)
+        if stream is None:
+            return
+        stream.subscribers.discard(subscriber)
+        if not stream.subscribers:
+            del self.streams[stream_filter]
+            await stream.stop()
+
+
+log_stream_hub = LogStreamHub()
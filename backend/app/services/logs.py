@@ -0,0 +1,223 @@
+import base64
+import json
+import re
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Optional
+
+from app.core.commands import stream_command
+
+# Unified log levels from least to most severe, and the one-/two-letter
+# codes `log show --style compact` prints for them
+LEVELS = ["debug", "info", "default", "error", "fault"]
+LEVEL_CODES = {"Db": "debug", "I": "info", "Df": "default", "E": "error", "F": "fault"}
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_RELATIVE = re.compile(r"^(\d+)([smhd])$")
+_RELATIVE_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+_COMPACT_LINE = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?:\.\d+)?\s+(Db|Df|I|E|F|A)\s+(.*)$"
+)
+
+
+@dataclass(frozen=True)
+class LogQuery:
+    """A time window plus filters, with since/until already made absolute"""
+    since: datetime
+    until: Optional[datetime] = None
+    predicate: Optional[str] = None
+    subsystem: Optional[str] = None
+    level: Optional[str] = None
+
+
+LogSource = Callable[[LogQuery], AsyncIterator[str]]
+
+
+def parse_time(value: str, now: Optional[datetime] = None) -> datetime:
+    """Parse an ISO timestamp or a relative offset like ``15m`` / ``2h``"""
+    now = now or datetime.now()
+    match = _RELATIVE.match(value.strip())
+    if match:
+        amount, unit = match.groups()
+        return now - timedelta(**{_RELATIVE_UNITS[unit]: int(amount)})
+    return datetime.fromisoformat(value)
+
+
+def build_predicate(query: LogQuery) -> Optional[str]:
+    """Combine the query's filters into one `log --predicate` expression"""
+    clauses = []
+    if query.predicate:
+        clauses.append(f"({query.predicate})")
+    if query.subsystem:
+        clauses.append(f"subsystem == {json.dumps(query.subsystem)}")
+    if query.level:
+        wanted = LEVELS[LEVELS.index(query.level):]
+        clauses.append("(" + " OR ".join(f"messageType == {lvl}" for lvl in wanted) + ")")
+    return " AND ".join(clauses) or None
+
+
+def build_log_args(query: LogQuery) -> list:
+    """Build the `log show` invocation so filtering happens inside `log`"""
+    args = ["log", "show", "--style", "compact", "--start", query.since.strftime(TIME_FORMAT)]
+    if query.until:
+        args += ["--end", query.until.strftime(TIME_FORMAT)]
+    # Like plain `log show`, info and debug messages are only read when asked for
+    if query.level == "debug":
+        args.append("--debug")
+    if query.level in ("debug", "info"):
+        args.append("--info")
+    predicate = build_predicate(query)
+    if predicate:
+        args += ["--predicate", predicate]
+    return args
+
+
+def command_source(query: LogQuery) -> AsyncIterator[str]:
+    """Stream lines from the macOS `log show` command"""
+    return stream_command(build_log_args(query), family="log")
+
+
+def file_source(path: str) -> LogSource:
+    """Build a source that replays compact-style log lines from a file
+
+    Only the time window and level are applied; predicate and subsystem filters are
+    left to `log` and ignored here. Without a level, info and debug lines are
+    skipped the way `log show` skips them.
+    """
+    async def source(query: LogQuery) -> AsyncIterator[str]:
+        minimum = LEVELS.index(query.level or "default")
+        with open(path, errors="replace") as f:
+            for line in f:
+                entry = parse_line(line.rstrip("\n"))
+                if entry is None or not entry.get("timestamp"):
+                    continue
+                ts = datetime.fromisoformat(entry["timestamp"])
+                if ts < query.since or (query.until and ts > query.until):
+                    continue
+                if LEVELS.index(entry["level"]) < minimum:
+                    continue
+                yield line.rstrip("\n")
+    return source
+
+
+def parse_line(line: str) -> Optional[dict]:
+    """Turn one compact-style line into an entry, or None for headers/blanks"""
+    if not line.strip() or line.startswith("Timestamp") or line.startswith("Filtering"):
+        return None
+    match = _COMPACT_LINE.match(line)
+    if not match:
+        # Continuation of a multi-line message
+        return {"timestamp": None, "level": None, "message": line}
+    timestamp, code, _ = match.groups()
+    return {
+        "timestamp": timestamp.replace(" ", "T"),
+        "level": LEVEL_CODES.get(code, "default"),
+        "message": line,
+    }
+
+
+def encode_cursor(query: LogQuery, skip: int) -> str:
+    state = {
+        "since": query.since.isoformat(),
+        "until": query.until.isoformat() if query.until else None,
+        "predicate": query.predicate,
+        "subsystem": query.subsystem,
+        "level": query.level,
+        "skip": skip,
+    }
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[LogQuery, int]:
+    """Recover the query a cursor resumes and how many entries to skip
+
+    The query's ``since`` is the second the previous page ended in, and
+    ``skip`` counts the entries from that second it already returned.
+    Raises ValueError for a malformed cursor.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        query = LogQuery(
+            since=datetime.fromisoformat(state["since"]),
+            until=datetime.fromisoformat(state["until"]) if state["until"] else None,
+            predicate=state["predicate"],
+            subsystem=state["subsystem"],
+            level=state["level"],
+        )
+        return query, int(state["skip"])
+    # ValueError covers bad base64, JSON and timestamps alike
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from None
+
+
+class LogQueryEngine:
+    """Answers log queries by streaming a source with bounded memory"""
+
+    def __init__(self, source: LogSource = command_source):
+        self.source = source
+
+    async def _entries(self, query: LogQuery) -> AsyncIterator[dict]:
+        async with aclosing(self.source(query)) as lines:
+            async for line in lines:
+                entry = parse_line(line)
+                if entry is not None:
+                    yield entry
+
+    async def tail(self, query: LogQuery, limit: int) -> dict:
+        """Return the last ``limit`` entries in the window
+
+        Only a ring buffer of ``limit`` entries is held, however much
+        output the source produces.
+        """
+        ring = deque(maxlen=limit)
+        async with aclosing(self._entries(query)) as entries:
+            async for entry in entries:
+                ring.append(entry)
+        return {"logs": list(ring), "next_cursor": None, "window": _window(query)}
+
+    async def page(self, query: LogQuery, limit: int, skip: int = 0) -> dict:
+        """Return ``limit`` entries and a cursor for the next page
+
+        Reading stops as soon as the page is full, which also stops the
+        underlying `log` process. The cursor restarts `log` at the second
+        the page ended in (``--start`` has one-second resolution) and skips
+        the entries from that second already returned, so each page only
+        reads its own part of the window.
+        """
+        if query.until is None:
+            query = replace(query, until=datetime.now())
+        logs = []
+        has_more = False
+        # The second the last entry read belongs to, and how many entries
+        # (continuation lines included) were read from it
+        second, in_second = query.since.replace(microsecond=0), 0
+        async with aclosing(self._entries(query)) as entries:
+            async for entry in entries:
+                if skip > 0:
+                    skip -= 1
+                elif len(logs) == limit:
+                    has_more = True
+                    break
+                else:
+                    logs.append(entry)
+                if entry["timestamp"]:
+                    timestamp = datetime.fromisoformat(entry["timestamp"])
+                    if timestamp != second:
+                        second, in_second = timestamp, 0
+                in_second += 1
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(replace(query, since=second), in_second)
+        return {"logs": logs, "next_cursor": next_cursor, "window": _window(query)}
+
+
+def _window(query: LogQuery) -> dict:
+    return {
+        "since": query.since.isoformat(),
+        "until": query.until.isoformat() if query.until else None,
+    }
+
+
+log_engine = LogQueryEngine()
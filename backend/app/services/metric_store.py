@@ -0,0 +1,304 @@
+import asyncio
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+from app.core.config import settings
+from app.services.metrics import metrics_sampler
+
+# Segment layout: an 8-byte header (magic, format version, flags, record
+# size) followed by fixed-width little-endian records in timestamp order.
+MAGIC = b"MACM"
+FORMAT_VERSION = 1
+FLAG_COMPACTED = 0x01
+HEADER = struct.Struct("<4sBBH")
+# timestamp, cpu %, memory %, disk %, bytes sent/recv, packets sent/recv
+RECORD = struct.Struct("<dfffQQQQ")
+FIELDS = [
+    "timestamp", "cpu", "memory", "disk",
+    "bytes_sent", "bytes_recv", "packets_sent", "packets_recv",
+]
+
+
+def segment_name(day: datetime) -> str:
+    return f"metrics-{day:%Y%m%d}.seg"
+
+
+def segment_day(name: str) -> Optional[datetime]:
+    if not (name.startswith("metrics-") and name.endswith(".seg")):
+        return None
+    try:
+        return datetime.strptime(name[8:16], "%Y%m%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def record_from_snapshot(snapshot: dict) -> bytes:
+    network = snapshot["network"]
+    return RECORD.pack(
+        snapshot["timestamp"],
+        snapshot["cpu"]["percent"],
+        snapshot["memory"]["percent"],
+        snapshot["disk"]["percent"],
+        network["bytes_sent"],
+        network["bytes_recv"],
+        network["packets_sent"],
+        network["packets_recv"],
+    )
+
+
+class Segment:
+    """Read-only, memory-mapped view of one day's segment file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.flags = 0
+        self.count = 0
+        if self._map is not None and size >= HEADER.size:
+            magic, version, self.flags, record_size = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+                raise ValueError(f"{path}: not a metrics segment")
+            # Ignore a torn record at the end left by a crash mid-write
+            self.count = (size - HEADER.size) // RECORD.size
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _timestamp(self, index: int) -> float:
+        return struct.unpack_from("<d", self._map, HEADER.size + index * RECORD.size)[0]
+
+    def _bisect(self, timestamp: float) -> int:
+        """Index of the first record at or after ``timestamp``"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamp(mid) < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def scan(self, start: float, end: float) -> Iterator[tuple]:
+        """Yield records with start <= timestamp < end straight from the map"""
+        if not self.count:
+            return
+        first = self._bisect(start)
+        last = self._bisect(end)
+        view = memoryview(self._map)[
+            HEADER.size + first * RECORD.size:HEADER.size + last * RECORD.size
+        ]
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+
+class MetricStore:
+    """Append-only on-disk metric history, one segment file per UTC day"""
+
+    def __init__(
+        self,
+        directory: str = settings.METRICS_STORE_DIR,
+        fsync_interval: float = settings.METRICS_STORE_FSYNC_INTERVAL,
+        retention_days: int = settings.METRICS_STORE_RETENTION_DAYS,
+        compact_after_days: int = settings.METRICS_STORE_COMPACT_AFTER_DAYS,
+        compact_step: int = settings.METRICS_STORE_COMPACT_STEP,
+    ):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.retention_days = retention_days
+        self.compact_after_days = compact_after_days
+        self.compact_step = compact_step
+        self._file = None
+        self._day: Optional[str] = None
+        self._last_sync = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open(self, name: str):
+        """Open a segment for appending, repairing a torn tail first"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(name)
+        f = open(path, "ab+")
+        size = f.seek(0, os.SEEK_END)
+        if size < HEADER.size:
+            f.truncate(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, RECORD.size))
+        else:
+            torn = (size - HEADER.size) % RECORD.size
+            if torn:
+                f.truncate(size - torn)
+        f.flush()
+        os.fsync(f.fileno())
+        self._file = f
+        self._day = name
+
+    def append(self, record: bytes, timestamp: float):
+        name = segment_name(datetime.fromtimestamp(timestamp, timezone.utc))
+        if name != self._day:
+            self.close()
+            self._open(name)
+        self._file.write(record)
+        if timestamp - self._last_sync >= self.fsync_interval:
+            self.sync()
+            self._last_sync = timestamp
+
+    def sync(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+            self._day = None
+
+    def segments(self) -> list[tuple[datetime, str]]:
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in os.listdir(self.directory):
+            day = segment_day(name)
+            if day is not None:
+                found.append((day, self._path(name)))
+        return sorted(found)
+
+    def scan(self, start: float, end: float) -> Iterator[tuple]:
+        """Yield raw records in [start, end) across day segments"""
+        if self._file is not None:
+            self._file.flush()
+        first_day = datetime.fromtimestamp(start, timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        for day, path in self.segments():
+            if day < first_day or day.timestamp() >= end:
+                continue
+            with Segment(path) as segment:
+                yield from segment.scan(start, end)
+
+    def query(self, start: float, end: float, step: int) -> list[dict]:
+        """Average records into ``step``-second buckets over [start, end)
+
+        Counters are reported as the last value in each bucket.
+        """
+        buckets = []
+        current = None
+        for record in self.scan(start, end):
+            bucket = int(record[0] // step)
+            if current is None or current[0] != bucket:
+                current = [bucket, 0.0, 0.0, 0.0, 0, record]
+                buckets.append(current)
+            current[1] += record[1]
+            current[2] += record[2]
+            current[3] += record[3]
+            current[4] += 1
+            current[5] = record
+        return [
+            {
+                "timestamp": bucket * step,
+                "cpu": cpu / n,
+                "memory": memory / n,
+                "disk": disk / n,
+                **dict(zip(FIELDS[4:], last[4:])),
+            }
+            for bucket, cpu, memory, disk, n, last in buckets
+        ]
+
+    def apply_retention(self, now: Optional[float] = None):
+        """Delete segments past retention and compact older full-resolution ones"""
+        now = now or time.time()
+        today = datetime.fromtimestamp(now, timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        for day, path in self.segments():
+            age = today - day
+            if age > timedelta(days=self.retention_days):
+                os.remove(path)
+            elif age >= timedelta(days=self.compact_after_days) and path != self._current_path():
+                self.compact(path)
+
+    def _current_path(self) -> Optional[str]:
+        return self._path(self._day) if self._day else None
+
+    def compact(self, path: str):
+        """Rewrite a segment downsampled to ``compact_step`` seconds, atomically"""
+        with Segment(path) as segment:
+            if segment.flags & FLAG_COMPACTED:
+                return
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as out:
+                out.write(HEADER.pack(MAGIC, FORMAT_VERSION, FLAG_COMPACTED, RECORD.size))
+                bucket = None
+                acc = None
+                for record in segment.scan(0, float("inf")):
+                    b = int(record[0] // self.compact_step)
+                    if b != bucket:
+                        if acc is not None:
+                            out.write(_pack_bucket(acc, bucket, self.compact_step))
+                        bucket, acc = b, [0.0, 0.0, 0.0, 0, record]
+                    acc[0] += record[1]
+                    acc[1] += record[2]
+                    acc[2] += record[3]
+                    acc[3] += 1
+                    acc[4] = record
+                if acc is not None:
+                    out.write(_pack_bucket(acc, bucket, self.compact_step))
+                out.flush()
+                os.fsync(out.fileno())
+        os.replace(tmp, path)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self.close)
+
+    async def _run(self):
+        next_maintenance = 0.0
+        while True:
+            snapshot = await metrics_sampler.wait_for_update()
+            try:
+                await asyncio.to_thread(
+                    self.append, record_from_snapshot(snapshot), snapshot["timestamp"]
+                )
+                if snapshot["timestamp"] >= next_maintenance:
+                    await asyncio.to_thread(self.apply_retention)
+                    next_maintenance = snapshot["timestamp"] + 3600
+            except Exception as e:
+                print(f"Metric store error: {e}")
+
+
+def _pack_bucket(acc: list, bucket: int, step: int) -> bytes:
+    cpu, memory, disk, n, last = acc
+    return RECORD.pack(bucket * step, cpu / n, memory / n, disk / n, *last[4:])
+
+
+metric_store = MetricStore()
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import psutil
+
+from app.core.config import settings
+
+
+class MetricsSampler:
+    """Samples system metrics in the background into a shared snapshot"""
+
+    def __init__(self, interval: float = settings.SYSTEM_UPDATE_INTERVAL):
+        self.interval = interval
+        self.snapshot: dict | None = None
+        self._task: asyncio.Task | None = None
+        self._updated = asyncio.Event()
+
+    def collect(self) -> dict:
+        """Take one sample of CPU, memory, disk and network counters"""
+        # interval=None measures CPU since the previous call, so the
+        # sampler never sleeps inside psutil
+        cpu_percent = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        network = psutil.net_io_counters()
+
+        return {
+            "timestamp": time.time(),
+            "cpu": {
+                "percent": cpu_percent,
+                "count": psutil.cpu_count(),
+                "count_logical": psutil.cpu_count(logical=True),
+            },
+            "memory": {
+                "total": memory.total,
+                "available": memory.available,
+                "percent": memory.percent,
+                "used": memory.used,
+                "free": memory.free,
+            },
+            "disk": {
+                "total": disk.total,
+                "used": disk.used,
+                "free": disk.free,
+                "percent": disk.percent,
+            },
+            "network": {
+                "bytes_sent": network.bytes_sent,
+                "bytes_recv": network.bytes_recv,
+                "packets_sent": network.packets_sent,
+                "packets_recv": network.packets_recv,
+            },
+            "boot_time": psutil.boot_time(),
+        }
+
+    def get_snapshot(self) -> dict:
+        """Return the latest snapshot, sampling once if the sampler never ran"""
+        if self.snapshot is None:
+            self.snapshot = self.collect()
+        return self.snapshot
+
+    async def wait_for_update(self) -> dict:
+        """Wait until the next sample has been taken and return it"""
+        await self._updated.wait()
+        return self.snapshot
+
+    async def start(self):
+        if self._task is not None:
+            return
+        # Prime the CPU counter so the first real sample is meaningful
+        psutil.cpu_percent(interval=None)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.snapshot = await asyncio.to_thread(self.collect)
+            except Exception as e:
+                print(f"Metrics sampler error: {e}")
+                continue
+            # Wake everyone waiting on this tick and arm a fresh event
+            updated, self._updated = self._updated, asyncio.Event()
+            updated.set()
+
+
+metrics_sampler = MetricsSampler()
@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import psutil
+
+from app.core.config import settings
+
+COUNTERS = [
+    "bytes_sent", "bytes_recv", "packets_sent", "packets_recv",
+    "errin", "errout", "dropin", "dropout",
+]
+
+
+def _rates(previous, current, elapsed: float) -> dict:
+    def rate(*fields):
+        delta = sum(getattr(current, f) - getattr(previous, f) for f in fields)
+        # Counters reset when an interface goes away and comes back
+        return max(0, delta) / elapsed
+    return {
+        "bytes_sent": rate("bytes_sent"),
+        "bytes_recv": rate("bytes_recv"),
+        "packets_sent": rate("packets_sent"),
+        "packets_recv": rate("packets_recv"),
+        "errors": rate("errin", "errout"),
+        "drops": rate("dropin", "dropout"),
+    }
+
+
+class NetworkMonitor:
+    """Samples per-interface counters on a schedule and keeps smoothed rates
+
+    Address tables are cached and only re-read when the set of interfaces
+    changes or NETWORK_ADDRESS_TTL expires, so request handlers never call
+    into psutil themselves.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.NETWORK_SAMPLE_INTERVAL,
+        alpha: float = settings.NETWORK_RATE_ALPHA,
+        address_ttl: float = settings.NETWORK_ADDRESS_TTL,
+    ):
+        self.interval = interval
+        self.alpha = alpha
+        self.address_ttl = address_ttl
+        self.timestamp: float | None = None
+        self.counters: dict = {}
+        self.total = None
+        self.rates: dict[str, dict] = {}
+        self.total_rates: dict = {}
+        self.addresses: dict[str, list] = {}
+        self._addresses_at = 0.0
+        self._task: asyncio.Task | None = None
+        self._updated = asyncio.Event()
+
+    def _read_addresses(self) -> dict[str, list]:
+        return {
+            name: [
+                {
+                    "family": addr.family.name,
+                    "address": addr.address,
+                    "netmask": addr.netmask,
+                }
+                for addr in addrs
+            ]
+            for name, addrs in psutil.net_if_addrs().items()
+        }
+
+    def sample(self):
+        """Take one sample; blocking, so the background task runs it in a thread"""
+        now = time.time()
+        counters = psutil.net_io_counters(pernic=True)
+        total = psutil.net_io_counters()
+
+        if set(counters) != set(self.counters) or now - self._addresses_at >= self.address_ttl:
+            self.addresses = self._read_addresses()
+            self._addresses_at = now
+
+        if self.timestamp is not None and now > self.timestamp:
+            elapsed = now - self.timestamp
+            rates = {}
+            for name, current in counters.items():
+                previous = self.counters.get(name)
+                if previous is None:
+                    continue
+                rates[name] = self._smooth(self.rates.get(name), _rates(previous, current, elapsed))
+            self.rates = rates
+            self.total_rates = self._smooth(self.total_rates, _rates(self.total, total, elapsed))
+
+        self.counters = counters
+        self.total = total
+        self.timestamp = now
+
+    def _smooth(self, previous: dict | None, current: dict) -> dict:
+        """Exponentially weighted moving average of two rate dicts"""
+        if not previous:
+            return current
+        a = self.alpha
+        return {k: a * v + (1 - a) * previous[k] for k, v in current.items()}
+
+    def totals(self) -> dict:
+        return {field: getattr(self.total, field) for field in COUNTERS}
+
+    def interfaces(self) -> list[dict]:
+        names = list(self.addresses) + [n for n in self.counters if n not in self.addresses]
+        return [
+            {
+                "name": name,
+                "addresses": self.addresses.get(name, []),
+                "stats": {
+                    "bytes_sent": self.counters[name].bytes_sent if name in self.counters else 0,
+                    "bytes_recv": self.counters[name].bytes_recv if name in self.counters else 0,
+                },
+            }
+            for name in names
+        ]
+
+    def rates_snapshot(self) -> dict:
+        return {
+            "timestamp": self.timestamp,
+            "interval": self.interval,
+            "total": self.total_rates,
+            "interfaces": self.rates,
+        }
+
+    def ensure_sampled(self):
+        if self.timestamp is None:
+            self.sample()
+
+    async def wait_for_update(self) -> dict:
+        await self._updated.wait()
+        return self.rates_snapshot()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self.sample()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.sample)
+            except Exception as e:
+                print(f"Network monitor error: {e}")
+                continue
+            updated, self._updated = self._updated, asyncio.Event()
+            updated.set()
+
+
+network_monitor = NetworkMonitor()
@@ -0,0 +1,132 @@
+import asyncio
+import heapq
+import time
+from typing import Optional
+
+import psutil
+
+from app.core.config import settings
+from app.services.processes import process_table, sort_key
+
+# psutil has no per-process I/O counters on macOS; connections work everywhere
+IO_SUPPORTED = hasattr(psutil.Process, "io_counters")
+# Rate columns only exist where io_counters does
+SORT_COLUMNS = (["read_rate", "write_rate", "total_rate"] if IO_SUPPORTED else []) + ["connections"]
+DEFAULT_SORT = "total_rate" if IO_SUPPORTED else "connections"
+
+
+def _connection_count(proc: psutil.Process) -> int:
+    connections = getattr(proc, "net_connections", None) or proc.connections
+    return len(connections(kind="inet"))
+
+
+class ProcessIOSampler:
+    """Attributes disk and network activity to processes on a fixed budget
+
+    Each cycle inspects at most ``budget`` PIDs from the process table,
+    continuing round-robin from where the previous cycle stopped, so the
+    cost per cycle is bounded however many processes exist. Rates are
+    computed between two inspections of the same process.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.PROCESS_IO_INTERVAL,
+        budget: int = settings.PROCESS_IO_BUDGET,
+    ):
+        self.interval = interval
+        self.budget = budget
+        self.stats: dict[int, dict] = {}
+        self._previous: dict[int, tuple] = {}
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _inspect(self, pid: int, now: float) -> Optional[dict]:
+        proc = process_table.handle(pid)
+        if proc is None:
+            return None
+        row = {"pid": pid, "name": process_table.rows.get(pid, {}).get("name")}
+        try:
+            with proc.oneshot():
+                row["connections"] = _connection_count(proc)
+                if IO_SUPPORTED:
+                    io = proc.io_counters()
+                    row["read_bytes"] = io.read_bytes
+                    row["write_bytes"] = io.write_bytes
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            return None
+        except psutil.AccessDenied:
+            row.setdefault("connections", None)
+
+        previous = self._previous.get(pid)
+        if "read_bytes" in row:
+            self._previous[pid] = (now, row["read_bytes"], row["write_bytes"])
+            if previous is not None and now > previous[0]:
+                elapsed = now - previous[0]
+                row["read_rate"] = max(0, row["read_bytes"] - previous[1]) / elapsed
+                row["write_rate"] = max(0, row["write_bytes"] - previous[2]) / elapsed
+                row["total_rate"] = row["read_rate"] + row["write_rate"]
+        row["sampled_at"] = now
+        return row
+
+    def sample(self):
+        """Inspect the next ``budget`` PIDs; blocking, run it in a thread"""
+        pids = sorted(process_table.rows)
+        alive = set(pids)
+        # Work on a copy and swap it in, so readers on the event loop never
+        # see the dict change size under them
+        stats = {pid: row for pid, row in self.stats.items() if pid in alive}
+        for pid in [p for p in self._previous if p not in alive]:
+            del self._previous[pid]
+
+        if pids:
+            now = time.time()
+            start = self._cursor % len(pids)
+            count = min(self.budget, len(pids))
+            for k in range(count):
+                pid = pids[(start + k) % len(pids)]
+                row = self._inspect(pid, now)
+                if row is None:
+                    stats.pop(pid, None)
+                else:
+                    stats[pid] = row
+            self._cursor = start + count
+        self.stats = stats
+
+    def top(self, n: int, column: str = "total_rate") -> list[dict]:
+        return heapq.nlargest(n, self.stats.values(), key=sort_key(column))
+
+    def coverage(self) -> dict:
+        return {
+            "inspected": len(self.stats),
+            "total": len(process_table.rows),
+            "budget": self.budget,
+            "interval": self.interval,
+            "io_supported": IO_SUPPORTED,
+        }
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.sample)
+            except Exception as e:
+                print(f"Process I/O sampler error: {e}")
+
+
+process_io_sampler = ProcessIOSampler()
@@ -0,0 +1,337 @@
+import asyncio
+import heapq
+import os
+import re
+import time
+from collections import deque
+from typing import Optional
+
+import psutil
+
+from app.core.config import settings
+
+ATTRS = ['pid', 'ppid', 'name', 'cpu_percent', 'memory_percent', 'status', 'create_time']
+# Attributes that are not kept in the table and are read on demand
+EXTRA_ATTRS = ['username', 'num_threads', 'nice', 'exe', 'cmdline']
+
+
+def sort_key(column: str):
+    """Key function that orders rows by ``column`` with missing values last"""
+    def key(row: dict):
+        value = row.get(column)
+        return (value is not None, value if value is not None else 0)
+    return key
+
+
+class ProcessTable:
+    """Persistent process table refreshed in the background
+
+    ``psutil.Process`` handles are kept across scans so ``cpu_percent`` is
+    measured between scans instead of reading 0 on a fresh handle. Every
+    scan bumps ``version``; clients can ask for just what was added,
+    changed or removed since a version they already have.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.SYSTEM_UPDATE_INTERVAL,
+        history: int = settings.PROCESS_TABLE_HISTORY,
+    ):
+        self.interval = interval
+        self.version = 0
+        self.timestamp: float | None = None
+        self.rows: dict[int, dict] = {}
+        self._handles: dict[int, psutil.Process] = {}
+        self._added_at: dict[int, int] = {}
+        self._changed_at: dict[int, int] = {}
+        # (version, removed pids) for the last ``history`` scans
+        self._removed: deque[tuple[int, list]] = deque(maxlen=history)
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def _collect(self) -> dict[int, dict]:
+        """Read every process through the persistent handles (runs in a thread)"""
+        rows = {}
+        handles = {}
+        for pid in psutil.pids():
+            proc = self._handles.get(pid)
+            try:
+                if proc is None or not proc.is_running():
+                    # New PID, or the old one was reused by another process
+                    proc = psutil.Process(pid)
+                with proc.oneshot():
+                    row = proc.as_dict(attrs=ATTRS)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            row['cpu_percent'] = round(row['cpu_percent'] or 0, 1)
+            row['memory_percent'] = round(row['memory_percent'] or 0, 2)
+            handles[pid] = proc
+            rows[pid] = row
+        self._handles = handles
+        return rows
+
+    def _apply(self, rows: dict[int, dict]):
+        version = self.version + 1
+        removed = [pid for pid in self.rows if pid not in rows]
+        for pid in removed:
+            self._added_at.pop(pid, None)
+            self._changed_at.pop(pid, None)
+        for pid, row in rows.items():
+            old = self.rows.get(pid)
+            if old is None or old['create_time'] != row['create_time']:
+                self._added_at[pid] = version
+                self._changed_at[pid] = version
+            elif old != row:
+                self._changed_at[pid] = version
+        self._removed.append((version, removed))
+        self.rows = rows
+        self.version = version
+        self.timestamp = time.time()
+
+    async def refresh(self):
+        """Scan now; concurrent callers share the lock so scans never overlap"""
+        async with self._lock:
+            rows = await asyncio.to_thread(self._collect)
+            self._apply(rows)
+
+    async def ensure_fresh(self):
+        """Make sure at least one scan has happened"""
+        if self.version == 0:
+            await self.refresh()
+
+    def snapshot(self) -> list[dict]:
+        return list(self.rows.values())
+
+    def delta(self, since: int) -> dict:
+        """Rows added/changed and PIDs removed after version ``since``
+
+        Falls back to a full listing when ``since`` is older than the
+        retained history. Clients should apply ``removed`` before ``added``,
+        since a PID can be removed and then reused within one delta.
+        """
+        oldest = self._removed[0][0] if self._removed else self.version
+        if since <= 0 or since < oldest - 1 or since > self.version:
+            return {
+                "version": self.version,
+                "full": True,
+                "processes": self.snapshot(),
+            }
+        added = [self.rows[pid] for pid, v in self._added_at.items() if v > since]
+        changed = [
+            self.rows[pid] for pid, v in self._changed_at.items()
+            if v > since and self._added_at[pid] <= since
+        ]
+        removed = [pid for v, pids in self._removed if v > since for pid in pids]
+        return {
+            "version": self.version,
+            "full": False,
+            "added": added,
+            "changed": changed,
+            "removed": removed,
+        }
+
+    def handle(self, pid: int) -> Optional[psutil.Process]:
+        """The cached handle for a PID seen in the last scan, if any"""
+        return self._handles.get(pid)
+
+    def fetch(self, pids, attrs: list) -> dict[int, dict]:
+        """Read extra attributes for some PIDs through the cached handles
+
+        Blocking; call it from a thread. Processes that went away or deny
+        access are left out.
+        """
+        result = {}
+        for pid in pids:
+            proc = self.handle(pid)
+            if proc is None:
+                continue
+            try:
+                result[pid] = proc.as_dict(attrs=attrs)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+        return result
+
+    async def query(
+        self,
+        fields: Optional[list] = None,
+        sort: Optional[str] = None,
+        descending: bool = True,
+        name: Optional[str] = None,
+        name_regex: Optional[re.Pattern] = None,
+        user: Optional[str] = None,
+        min_cpu: Optional[float] = None,
+        min_memory: Optional[float] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> tuple[list[dict], int]:
+        """Filter, sort, page and project the table; returns (rows, total)
+
+        Extra attributes are only read for the rows that need them: every
+        candidate when filtering or sorting by one, otherwise just the page.
+        """
+        rows = self.rows.values()
+        if name:
+            needle = name.lower()
+            rows = [r for r in rows if r['name'] and needle in r['name'].lower()]
+        if name_regex:
+            rows = [r for r in rows if r['name'] and name_regex.search(r['name'])]
+        if min_cpu is not None:
+            rows = [r for r in rows if r['cpu_percent'] >= min_cpu]
+        if min_memory is not None:
+            rows = [r for r in rows if r['memory_percent'] >= min_memory]
+        rows = list(rows)
+
+        wanted = fields or ATTRS
+        early = [a for a in EXTRA_ATTRS if a == sort or (a == 'username' and user)]
+        if early:
+            extra = await asyncio.to_thread(self.fetch, [r['pid'] for r in rows], early)
+            rows = [{**r, **extra[r['pid']]} for r in rows if r['pid'] in extra]
+        if user:
+            rows = [r for r in rows if r.get('username') == user]
+
+        total = len(rows)
+        if sort:
+            if limit is not None:
+                pick = heapq.nlargest if descending else heapq.nsmallest
+                rows = pick(offset + limit, rows, key=sort_key(sort))
+            else:
+                rows = sorted(rows, key=sort_key(sort), reverse=descending)
+        rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+
+        late = [a for a in wanted if a in EXTRA_ATTRS and a not in early]
+        if late:
+            extra = await asyncio.to_thread(self.fetch, [r['pid'] for r in rows], late)
+            rows = [{**r, **extra.get(r['pid'], dict.fromkeys(late))} for r in rows]
+        if fields:
+            rows = [{f: r.get(f) for f in fields} for r in rows]
+        return rows, total
+
+    def tree(self, root: Optional[int] = None) -> list[dict]:
+        """Nest the table by parent PID, built from one scan via a ppid index
+
+        Returns the subtree under ``root``, or every top-level process when
+        ``root`` is None. Missing parents make a process top-level.
+        """
+        children: dict[int, list[int]] = {}
+        for pid, row in self.rows.items():
+            children.setdefault(row['ppid'], []).append(pid)
+
+        if root is None:
+            roots = [
+                pid for pid, row in self.rows.items()
+                if row['ppid'] not in self.rows or row['ppid'] == pid
+            ]
+        else:
+            roots = [root] if root in self.rows else []
+
+        def node(pid: int) -> dict:
+            return {**self.rows[pid], "children": []}
+
+        result = [node(pid) for pid in roots]
+        # Iterative walk so deep chains can't hit the recursion limit
+        stack = list(result)
+        while stack:
+            parent = stack.pop()
+            for pid in children.get(parent['pid'], []):
+                if pid == parent['pid']:
+                    continue
+                child = node(pid)
+                parent['children'].append(child)
+                stack.append(child)
+        return result
+
+    def top(self, n: int, key: str = 'cpu_percent') -> list[dict]:
+        """N largest rows by ``key`` using a heap instead of a full sort"""
+        return heapq.nlargest(n, self.rows.values(), key=sort_key(key))
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Process table error: {e}")
+            await asyncio.sleep(self.interval)
+
+
+def kill_processes(pids: list, timeout: float) -> dict[int, str]:
+    """Terminate PIDs together, escalating to SIGKILL after ``timeout``
+
+    Blocking; call it from a thread. Returns a status per PID: terminated,
+    killed, not_found, access_denied or survived.
+    """
+    results: dict[int, str] = {}
+    procs = []
+    for pid in dict.fromkeys(pids):
+        try:
+            proc = psutil.Process(pid)
+            proc.terminate()
+            procs.append(proc)
+        except psutil.NoSuchProcess:
+            results[pid] = "not_found"
+        except psutil.AccessDenied:
+            results[pid] = "access_denied"
+
+    gone, alive = psutil.wait_procs(procs, timeout=timeout)
+    for proc in gone:
+        results[proc.pid] = "terminated"
+    for proc in alive:
+        try:
+            proc.kill()
+        except psutil.NoSuchProcess:
+            results[proc.pid] = "terminated"
+        except psutil.AccessDenied:
+            results[proc.pid] = "access_denied"
+
+    alive = [p for p in alive if p.pid not in results]
+    gone, alive = psutil.wait_procs(alive, timeout=timeout)
+    for proc in gone:
+        results[proc.pid] = "killed"
+    for proc in alive:
+        # A zombie is dead, it just hasn't been reaped by its parent yet
+        results[proc.pid] = "killed" if _is_zombie(proc) else "survived"
+    return results
+
+
+def _is_zombie(proc: psutil.Process) -> bool:
+    try:
+        return proc.status() == psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return True
+
+
+def protected_pids() -> set[int]:
+    """PIDs a bulk kill must never touch: the kernel, launchd/init, this
+    server and the processes it runs under"""
+    pids = {0, 1, os.getpid()}
+    try:
+        pids.update(parent.pid for parent in psutil.Process().parents())
+    except psutil.Error:
+        pass
+    return pids
+
+
+def subtree_pids(root: int) -> list[int]:
+    """The live descendants of ``root`` followed by ``root`` itself"""
+    try:
+        proc = psutil.Process(root)
+        return [child.pid for child in proc.children(recursive=True)] + [root]
+    except psutil.NoSuchProcess:
+        return [root]
+
+
+process_table = ProcessTable()
@@ -0,0 +1,156 @@
+import asyncio
+import re
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.core.commands import CommandTimeout, run_command
+from app.core.config import settings
+
+_SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+_SIZE = re.compile(r"^\s*([\d.]+)\s*([KMG]?)(?:i?B)?\s*$", re.IGNORECASE)
+# Pre-Catalina: "\tSafari (13.0), 12345K [recommended] [restart]"
+_LEGACY_DETAILS = re.compile(r"^(?P<title>.*?) \((?P<version>[^)]*)\), (?P<size>\S+)(?P<flags>.*)$")
+
+
+class SoftwareUpdate(BaseModel):
+    label: str
+    title: Optional[str] = None
+    version: Optional[str] = None
+    size: Optional[int] = None
+    recommended: bool = False
+    restart_required: bool = False
+
+
+def parse_size(text: str) -> Optional[int]:
+    """Sizes like "1234567KiB" or "154283K" in bytes"""
+    match = _SIZE.match(text)
+    if match is None:
+        return None
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def _parse_fields(details: str) -> dict:
+    # "Title: macOS Sonoma 14.2.1, Version: 14.2.1, Size: 1234567KiB, Recommended: YES, Action: restart,"
+    fields = {}
+    for match in re.finditer(r"(\w[\w ]*?): (.*?)(?:,\s*(?=\w[\w ]*?: )|,?\s*$)", details.strip()):
+        fields[match.group(1).lower()] = match.group(2).strip()
+    return fields
+
+
+def parse_softwareupdate(output: str) -> list[SoftwareUpdate]:
+    """Parse ``softwareupdate -l`` output, current and pre-Catalina formats"""
+    updates = []
+    current: Optional[SoftwareUpdate] = None
+    for line in output.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("*"):
+            label = stripped.lstrip("* ").strip()
+            if label.startswith("Label:"):
+                label = label[len("Label:"):].strip()
+            current = SoftwareUpdate(label=label)
+            updates.append(current)
+        elif current is not None and line.startswith(("\t", " ")) and stripped:
+            if stripped.startswith("Title:"):
+                fields = _parse_fields(stripped)
+                current.title = fields.get("title")
+                current.version = fields.get("version")
+                current.size = parse_size(fields.get("size", ""))
+                current.recommended = fields.get("recommended", "").upper() == "YES"
+                current.restart_required = fields.get("action", "").lower() == "restart"
+            else:
+                match = _LEGACY_DETAILS.match(stripped)
+                if match:
+                    current.title = match.group("title")
+                    current.version = match.group("version").strip() or None
+                    current.size = parse_size(match.group("size"))
+                    current.recommended = "[recommended]" in match.group("flags")
+                    current.restart_required = "[restart]" in match.group("flags")
+            current = None
+    return updates
+
+
+class SoftwareUpdateChecker:
+    """Runs ``softwareupdate -l`` on a schedule and keeps the parsed result
+
+    The check contacts Apple's catalog and can take a minute or more, so
+    requests are answered from the last result. ``refresh()`` joins a
+    check already in progress instead of starting another.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.SOFTWARE_UPDATE_INTERVAL,
+        timeout: float = settings.SOFTWARE_UPDATE_TIMEOUT,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.updates: list[SoftwareUpdate] = []
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self._checking: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def checking(self) -> bool:
+        return self._checking is not None and not self._checking.done()
+
+    def snapshot(self) -> dict:
+        return {
+            "available": len(self.updates) > 0,
+            "updates": [update.model_dump() for update in self.updates],
+            "checked_at": self.checked_at,
+            "age": time.time() - self.checked_at if self.checked_at else None,
+            "checking": self.checking,
+            "error": self.error,
+        }
+
+    async def refresh(self) -> dict:
+        if not self.checking:
+            self._checking = asyncio.ensure_future(self._check())
+        await asyncio.shield(self._checking)
+        return self.snapshot()
+
+    async def _check(self):
+        try:
+            returncode, stdout, stderr = await run_command(
+                ['softwareupdate', '-l'], timeout=self.timeout, family="softwareupdate"
+            )
+        except CommandTimeout as e:
+            self.error = str(e)
+            return
+        # "No new software available." goes to stderr with exit code 0
+        if returncode != 0:
+            self.error = stderr.strip() or f"softwareupdate exited with {returncode}"
+            return
+        self.updates = parse_softwareupdate(stdout)
+        self.error = None
+        self.checked_at = time.time()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.error = str(e)
+                print(f"Software update check error: {e}")
+            await asyncio.sleep(self.interval)
+
+
+software_update_checker = SoftwareUpdateChecker()
@@ -0,0 +1,39 @@
+import asyncio
+
+from app.services import brew
+from app.services.brew import BrewInventory
+
+
+def test_missing_prefix_without_brew_loads_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(brew.shutil, "which", lambda name: None)
+    inventory = BrewInventory(prefix=str(tmp_path / "missing"))
+
+    snapshot = asyncio.run(asyncio.wait_for(inventory.get(), 5))
+
+    assert snapshot["installed"] is False
+    assert inventory._stale() is False
+
+
+def test_invalidate_during_load_discards_it(monkeypatch, tmp_path):
+    monkeypatch.setattr(brew.shutil, "which", lambda name: None)
+    inventory = BrewInventory(prefix=str(tmp_path))
+    resolved = []
+
+    async def resolve():
+        resolved.append(len(resolved) + 1)
+        await asyncio.sleep(0.01)
+        return {"installed": False, "path": None, "version": str(len(resolved)), "prefix": str(tmp_path)}
+
+    inventory._resolve = resolve
+
+    async def get_and_invalidate():
+        pending = asyncio.ensure_future(inventory.get())
+        while not resolved:
+            await asyncio.sleep(0)
+        inventory.invalidate()
+        return await pending
+
+    snapshot = asyncio.run(get_and_invalidate())
+
+    assert snapshot["version"] == "2"
+    assert resolved == [1, 2]
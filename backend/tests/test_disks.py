@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from collections import namedtuple
+
+from app.services import disks
+from app.services.disks import DiskScanner
+
+Partition = namedtuple("Partition", "device mountpoint fstype")
+Usage = namedtuple("Usage", "total used free percent")
+
+
+def scanner(monkeypatch, partitions, disk_usage, workers=1):
+    monkeypatch.setattr(disks.psutil, "disk_partitions", lambda: partitions)
+    monkeypatch.setattr(disks.psutil, "disk_usage", disk_usage)
+    return DiskScanner(workers=workers, timeout=0.2, partitions_ttl=3600)
+
+
+def test_unchanged_usage_keeps_updated_at(monkeypatch):
+    usage = Usage(100, 40, 60, 40.0)
+    disk_scanner = scanner(monkeypatch, [Partition("/dev/disk1", "/", "apfs")], lambda m: usage)
+
+    first = asyncio.run(disk_scanner.scan())
+    second = asyncio.run(disk_scanner.scan())
+    usage = Usage(100, 50, 50, 50.0)
+    third = asyncio.run(disk_scanner.scan())
+
+    assert first == second
+    assert third[0]["used"] == 50
+    assert third[0]["updated_at"] > first[0]["updated_at"]
+    disk_scanner.shutdown()
+
+
+def test_hung_network_mount_does_not_block_local_disks(monkeypatch):
+    hung = threading.Event()
+
+    def disk_usage(mountpoint):
+        if mountpoint.startswith("/Volumes/share"):
+            hung.wait()
+        return Usage(100, 10, 90, 10.0)
+
+    disk_scanner = scanner(monkeypatch, [
+        Partition("//server/a", "/Volumes/share-a", "smbfs"),
+        Partition("//server/b", "/Volumes/share-b", "nfs"),
+        Partition("/dev/disk1", "/", "apfs"),
+    ], disk_usage)
+
+    result = {p["mountpoint"]: p for p in asyncio.run(disk_scanner.scan())}
+
+    assert result["/"]["stale"] is False
+    assert result["/"]["used"] == 10
+    assert result["/Volumes/share-a"]["stale"] is True
+    assert result["/Volumes/share-b"]["used"] is None
+    hung.set()
+    disk_scanner.shutdown()
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from app.api.endpoints import brew as brew_endpoints
+from app.services.brew import BrewOutcomeParser
+from app.services.jobs import JobManager, read_lines
+
+FAKE_BREW = Path(__file__).parent / "fixtures" / "brew"
+
+
+@pytest.fixture(autouse=True)
+def fake_brew(monkeypatch):
+    monkeypatch.setenv("PATH", f"{FAKE_BREW}{os.pathsep}{os.environ['PATH']}")
+
+
+def lines_from(*chunks: bytes, line_limit: int = 1024) -> list:
+    async def collect():
+        stream = asyncio.StreamReader()
+        for chunk in chunks:
+            stream.feed_data(chunk)
+        stream.feed_eof()
+        return [line async for line in read_lines(stream, line_limit)]
+    return asyncio.run(collect())
+
+
+def test_read_lines_keeps_last_progress_state():
+    assert lines_from(b"10%\r50%\r100%\r\nDone\n") == ["100%", "Done"]
+
+
+def test_read_lines_across_chunks_and_without_final_newline():
+    assert lines_from(b"first\nsec", b"ond\r\n10", b"%\r99", b"%") == ["first", "second", "99%"]
+
+
+def test_read_lines_truncates_long_lines():
+    assert lines_from(b"x" * 5000 + b"\nshort\n", line_limit=10) == ["x" * 10, "short"]
+
+
+def run_jobs(manager: JobManager, *submissions):
+    async def run():
+        jobs = [manager.submit(**submission) for submission in submissions]
+        await asyncio.gather(*(job._task for job in jobs))
+        return jobs
+    return asyncio.run(run())
+
+
+def test_job_runs_fake_brew_and_summarizes():
+    commands = [["brew", "install", "wget", "missing"]]
+    [job] = run_jobs(JobManager(), dict(
+        kind="install", commands=commands, resource="brew", description="Install",
+        observer=BrewOutcomeParser([["wget", "missing"]]),
+    ))
+
+    assert job.status == "failed"
+    assert job.exit_codes == [1]
+    assert job.summary == {"wget": "installed", "missing": "not_found"}
+    stdout = [e["line"] for e in job.events if e["stream"] == "stdout"]
+    assert stdout == [
+        "==> Downloading wget",
+        "############ 100.0%",
+        "/usr/local/Cellar/wget/1.0: 12 files, 3.4MB",
+    ]
+    assert job.events[0] == {"seq": 1, "command": 0, "stream": "meta", "line": "$ brew install wget missing"}
+
+
+def test_jobs_on_one_resource_run_one_at_a_time():
+    first, second, other = run_jobs(
+        JobManager(),
+        dict(kind="a", commands=[["brew", "sleep", "0.3"]], resource="brew", description="a"),
+        dict(kind="b", commands=[["brew", "sleep", "0.2"]], resource="brew", description="b"),
+        dict(kind="c", commands=[["brew", "sleep", "0.25"]], resource="other", description="c"),
+    )
+
+    assert [j.status for j in (first, second, other)] == ["succeeded"] * 3
+    assert second.started_at >= first.finished_at
+    # A different resource doesn't wait behind the first one
+    assert other.started_at < first.finished_at
+
+
+def test_job_timeout_kills_the_command():
+    [job] = run_jobs(JobManager(), dict(
+        kind="slow", commands=[["brew", "sleep", "5"]], resource="brew",
+        description="slow", timeout=0.2,
+    ))
+
+    assert job.status == "failed"
+    assert job.error == "Timed out after 0.2s"
+    assert job.finished_at - job.started_at < 2
+
+
+def test_job_events_stream_as_sse(monkeypatch):
+    manager = JobManager()
+    monkeypatch.setattr(brew_endpoints, "job_manager", manager)
+
+    async def stream():
+        job = manager.submit(
+            kind="install", commands=[["brew", "install", "wget"]],
+            resource="brew", description="Install wget",
+        )
+        response = await brew_endpoints.stream_job_events(job.id, after=1, current_user={})
+        return [chunk async for chunk in response.body_iterator]
+
+    frames = asyncio.run(stream())
+
+    outputs = [f for f in frames if "event: output" in f]
+    assert [f.split("\n")[0] for f in outputs] == ["id: 2", "id: 3", "id: 4"]
+    assert json.loads(outputs[1].split("data: ", 1)[1])["line"] == "############ 100.0%"
+    assert frames[-1].startswith("event: status\n")
+    status = json.loads(frames[-1].split("data: ", 1)[1])
+    assert status["status"] == "succeeded"
+    assert status["last_seq"] == 4
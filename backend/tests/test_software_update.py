@@ -0,0 +1,156 @@
+import asyncio
+from pathlib import Path
+
+from app.services import software_update
+from app.services.software_update import (
+    SoftwareUpdate,
+    SoftwareUpdateChecker,
+    parse_size,
+    parse_softwareupdate,
+)
+
+FIXTURES = Path(__file__).parent / "fixtures" / "softwareupdate"
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text()
+
+
+def test_parse_current_format():
+    assert parse_softwareupdate(fixture("current.txt")) == [
+        SoftwareUpdate(
+            label="macOS Sonoma 14.2.1-23C71",
+            title="macOS Sonoma 14.2.1",
+            version="14.2.1",
+            size=7209216 * 1024,
+            recommended=True,
+            restart_required=True,
+        ),
+        SoftwareUpdate(
+            label="Command Line Tools for Xcode-15.1",
+            title="Command Line Tools for Xcode",
+            version="15.1",
+            size=735011 * 1024,
+            recommended=True,
+            restart_required=False,
+        ),
+        SoftwareUpdate(
+            label="Safari17.2.1VenturaAuto-17.2.1",
+            title="Safari",
+            version="17.2.1",
+            size=154283 * 1024,
+            recommended=False,
+            restart_required=False,
+        ),
+    ]
+
+
+def test_parse_legacy_format():
+    assert parse_softwareupdate(fixture("legacy.txt")) == [
+        SoftwareUpdate(
+            label="Safari13.0.4MojaveAuto-13.0.4",
+            title="Safari",
+            version="13.0.4",
+            size=67158 * 1024,
+            recommended=True,
+            restart_required=False,
+        ),
+        SoftwareUpdate(
+            label="macOS 10.14.6 Supplemental Update-",
+            title="macOS 10.14.6 Supplemental Update",
+            version=None,
+            size=1266904 * 1024,
+            recommended=True,
+            restart_required=True,
+        ),
+        SoftwareUpdate(
+            label="iTunesX-12.9.5",
+            title="iTunes",
+            version="12.9.5",
+            size=271360 * 1024,
+            recommended=False,
+            restart_required=False,
+        ),
+    ]
+
+
+def test_parse_no_updates():
+    assert parse_softwareupdate(fixture("none.txt")) == []
+
+
+def test_parse_size():
+    assert parse_size("1234KiB") == 1234 * 1024
+    assert parse_size("154283K") == 154283 * 1024
+    assert parse_size("2.5M") == int(2.5 * 1024 ** 2)
+    assert parse_size("Unknown") is None
+
+
+def recorded(stdout: str, stderr: str = "", returncode: int = 0):
+    calls = []
+
+    async def run_command(cmd, timeout=None, family=None, request=None):
+        calls.append(cmd)
+        await asyncio.sleep(0.01)
+        return returncode, stdout, stderr
+
+    run_command.calls = calls
+    return run_command
+
+
+def test_checker_serves_parsed_result(monkeypatch):
+    fake = recorded(fixture("current.txt"))
+    monkeypatch.setattr(software_update, "run_command", fake)
+    checker = SoftwareUpdateChecker(interval=3600, timeout=10)
+
+    snapshot = asyncio.run(checker.refresh())
+
+    assert snapshot["available"] is True
+    assert [u["label"] for u in snapshot["updates"]] == [
+        "macOS Sonoma 14.2.1-23C71",
+        "Command Line Tools for Xcode-15.1",
+        "Safari17.2.1VenturaAuto-17.2.1",
+    ]
+    assert snapshot["error"] is None
+    assert snapshot["checked_at"] is not None
+    assert fake.calls == [["softwareupdate", "-l"]]
+
+
+def test_checker_no_updates(monkeypatch):
+    monkeypatch.setattr(
+        software_update, "run_command", recorded(fixture("none.txt"), fixture("none.stderr.txt"))
+    )
+    checker = SoftwareUpdateChecker(interval=3600, timeout=10)
+
+    snapshot = asyncio.run(checker.refresh())
+
+    assert snapshot["available"] is False
+    assert snapshot["updates"] == []
+    assert snapshot["error"] is None
+
+
+def test_concurrent_refreshes_share_one_check(monkeypatch):
+    fake = recorded(fixture("legacy.txt"))
+    monkeypatch.setattr(software_update, "run_command", fake)
+    checker = SoftwareUpdateChecker(interval=3600, timeout=10)
+
+    async def refresh_twice():
+        return await asyncio.gather(checker.refresh(), checker.refresh())
+
+    first, second = asyncio.run(refresh_twice())
+
+    assert len(fake.calls) == 1
+    assert first["updates"] == second["updates"]
+
+
+def test_failed_check_keeps_previous_result(monkeypatch):
+    checker = SoftwareUpdateChecker(interval=3600, timeout=10)
+    monkeypatch.setattr(software_update, "run_command", recorded(fixture("current.txt")))
+    asyncio.run(checker.refresh())
+
+    monkeypatch.setattr(
+        software_update, "run_command", recorded("", "Cannot connect to the catalog", returncode=1)
+    )
+    snapshot = asyncio.run(checker.refresh())
+
+    assert len(snapshot["updates"]) == 3
+    assert snapshot["error"] == "Cannot connect to the catalog"